@@ -16,23 +16,52 @@ import copy
 import time
 # Useful for compiling Network in machine code
 import os
+from Compiler import *
+# Useful for names of files unique to each Herd
+import itertools
+# Useful to know if an activation function can work in place
+import inspect
+# Useful for the binary save format
+import json
+import struct
+import zlib
+import io
+# Counter-based random numbers, the same in every backend
+from Random import *
+# Shares the cores between workers and BLAS threads
+from Threads import *
 # Useful for easy data visualisation
 import matplotlib.pyplot as plt
 
 
 # activation functions
-
-def sigmoid(x):
-	return(-1 + 2/(1+np.e**(-x)))
-
-def ramp(x):
-    return(x*(x>0))
-
-def segments(x):
-    return((-1-x)*(x<-1) + x + (1-x)*(x>1))
-
-def threshold(x):
-    return(1*(x>0) + 0 -1*(x<0))
+# When out is given the result is written in it without any allocation
+# (out can be x itself)
+
+def sigmoid(x, out = None):
+    if out is None:
+        return(-1 + 2/(1+np.e**(-x)))
+    np.negative(x, out=out)
+    np.exp(out, out=out)
+    out += 1
+    np.divide(2, out, out=out)
+    out -= 1
+    return(out)
+
+def ramp(x, out = None):
+    if out is None:
+        return(x*(x>0))
+    return(np.maximum(x, 0, out=out))
+
+def segments(x, out = None):
+    if out is None:
+        return((-1-x)*(x<-1) + x + (1-x)*(x>1))
+    return(np.clip(x, -1, 1, out=out))
+
+def threshold(x, out = None):
+    if out is None:
+        return(1.0*(x>0) - 1.0*(x<0))
+    return(np.sign(x, out=out))
 
 def convolution(entry, kernel):
     """
@@ -60,13 +89,183 @@ def convolution(entry, kernel):
             iterator[i] += 1
     return(output)
 
+# mutation functions
+# They all mutate in place a genome of shape (nb_members, nb_genes),
+# neurons gives for each gene the neuron it belongs to
+# rng is a numpy Generator or a Counter_Random, every draw has the members
+# as first dimension so that a member mutates the same way whatever members
+# are mutated with it
+
+def masked_normal(rng, size, probability, amplitude):
+    """
+    Flat indexes of the genes that mutate (each with probability) and the
+    normal numbers added to them
+    A Counter_Random only computes the numbers that are used
+    """
+    if isinstance(rng, Counter_Random):
+        return(rng.masked_normal(0, amplitude, size, probability))
+    indexes = np.flatnonzero(rng.random(size) < probability)
+    return(indexes, rng.normal(0, amplitude, indexes.size))
+
+def gaussian_mutation(genome, neurons, mutation_coefficent,
+                      mutation_amplitude, rng=None):
+    """
+    Each gene mutates with a probability of mutation_coefficent
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    indexes, values = masked_normal(rng, genome.shape, mutation_coefficent,
+                                    mutation_amplitude)
+    genome[np.unravel_index(indexes, genome.shape)] += values
+
+def row_mutation(genome, neurons, mutation_coefficent, mutation_amplitude,
+                 rng=None):
+    """
+    Each neuron mutates all its incoming weights and its bias at once
+    with a probability of mutation_coefficent
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    rows = rng.random((genome.shape[0], neurons.max() + 1))
+    indexes = np.flatnonzero((rows < mutation_coefficent)[:, neurons])
+    if isinstance(rng, Counter_Random):
+        values = rng.normal_at(0, mutation_amplitude, genome.shape, indexes)
+    else:
+        values = rng.normal(0, mutation_amplitude, indexes.size)
+    genome[np.unravel_index(indexes, genome.shape)] += values
+
+def sparse_mutation(genome, neurons, mutation_coefficent, mutation_amplitude,
+                    rng=None):
+    """
+    Exactly mutation_coefficent*nb_genes genes mutate in each member
+    (they are drawn with replacement so a gene can mutate twice)
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    nb_members, nb_genes = genome.shape
+    k = int(round(mutation_coefficent*nb_genes))
+    members = np.repeat(np.arange(nb_members), k)
+    genes = rng.integers(0, nb_genes, (nb_members, k)).ravel()
+    np.add.at(genome, (members, genes),
+              rng.normal(0, mutation_amplitude, (nb_members, k)).ravel())
+
 # Save function
+# A binary save file is a list of records, one per Network :
+#   "NDNN", version (uint8), compressed (uint8), header length (uint32)
+#   header : json with the topology of the Network
+#   payload length (uint64)
+#   payload : genome then values as little-endian float64 (maybe zlib-ed)
+#   zeros up to the next multiple of 8 bytes
+# Everything is aligned on 8 bytes so that uncompressed payloads can be
+# memory-mapped
+
+SAVE_MAGIC = b"NDNN"
+SAVE_VERSION = 1
+
+def activations():
+    """
+    The activation functions that can be saved, by name
+    """
+    return({f.__name__: f for f in [sigmoid, ramp, segments, threshold]})
 
-def load_network(file_name):
+def write_network(f, N, compress = False):
+    """
+    Writes one Network record at the current position of the binary file f
+    """
+    regions = getattr(N, "regions", None)
+    if regions is not None:
+        regions = np.asarray(regions).tolist()
+    genome = N.genome()
+    header = json.dumps({
+        "nb_sensors": N.nb_sensors,
+        "nb_actors": N.nb_actors,
+        "nb_add_neurons": N.nb_add_neurons,
+        "period": N.period,
+        "function": N.function.__name__,
+        "reset_after_process": N.reset_after_process,
+        "slices": getattr(N, "slices", None),
+        "regions": regions,
+        "nb_genes": len(genome),
+    }).encode()
+    header += b" "*(-(len(SAVE_MAGIC) + 6 + len(header)) % 8)
+    payload = np.concatenate((genome, N.values)).astype("<f8").tobytes()
+    if compress:
+        payload = zlib.compress(payload)
+    f.write(
+        SAVE_MAGIC
+        + struct.pack("<BBI", SAVE_VERSION, compress, len(header))
+        + header
+        + struct.pack("<Q", len(payload))
+        + payload
+        + b"\0"*(-len(payload) % 8)
+    )
+
+def read_network(f, mmap = False):
+    """
+    Reads the Network record at the current position of the binary file f
+    Returns None at the end of the file
+    With mmap the parameters stay in the file until they are modified
+    (copy on write), compressed records are always read
+    """
+    magic = f.read(len(SAVE_MAGIC))
+    if magic != SAVE_MAGIC:
+        return(None)
+    version, compressed, header_length = struct.unpack("<BBI", f.read(6))
+    if version > SAVE_VERSION:
+        raise(ValueError("Unknown save version {}".format(version)))
+    header = json.loads(f.read(header_length))
+    payload_length, = struct.unpack("<Q", f.read(8))
+    payload_offset = f.tell()
+    nb_neurons = (header["nb_sensors"] + header["nb_actors"]
+                  + header["nb_add_neurons"])
+    if mmap and not compressed:
+        data = np.memmap(f.name, dtype="<f8", mode="c", offset=payload_offset,
+                         shape=(header["nb_genes"] + nb_neurons, ))
+    else:
+        payload = f.read(payload_length)
+        if compressed:
+            payload = zlib.decompress(payload)
+        data = np.frombuffer(payload, dtype="<f8").copy()
+    f.seek(payload_offset + payload_length + (-payload_length % 8))
+    nb_weights = header["nb_genes"] - nb_neurons
+    if header["slices"] is not None:
+        weights = Blocks(header["slices"], header["regions"],
+                         data[:nb_weights])
+    else:
+        weights = data[:nb_weights].reshape((nb_neurons, nb_neurons))
+    function = activations().get(header["function"])
+    if function is None:
+        raise(ValueError("Unknown activation function {}".format(
+            header["function"])))
+    N = Network(header["nb_sensors"], header["nb_actors"],
+                header["nb_add_neurons"], header["period"], function,
+                header["reset_after_process"], weights=weights,
+                bias=data[nb_weights:header["nb_genes"]])
+    N.values = np.array(data[header["nb_genes"]:])
+    return(N)
+
+def load_network(file_name, mmap = False):
     """
     Extract all the Networks from a save file and put them in a list
-    I lose data in the process, must investigate that
-    seems that np.float64 doesn't do the job
+    Both the binary and the old text formats are read
+    """
+    f = open(file_name, "rb")
+    binary = f.read(len(SAVE_MAGIC)) == SAVE_MAGIC
+    f.close()
+    if not binary:
+        return(load_text_network(file_name))
+    f = open(file_name, "rb")
+    r = []
+    N = read_network(f, mmap)
+    while N is not None:
+        r.append(N)
+        N = read_network(f, mmap)
+    f.close()
+    return(r)
+
+def load_text_network(file_name):
+    """
+    Extract all the Networks from an old text save file
     """
     f = open(file_name, "r")
     r = []
@@ -89,33 +288,49 @@ def load_network(file_name):
                 values[i] = np.float64(f.readline())
             N = Network(nb_sensors, nb_actors, nb_add_neurons, period,
                         weights=weights, bias=bias)
+            N.values = values
             r.append(N)
         else:
             exit = True
+    f.close()
     return(r)
 
+def convert_save(file_name, new_file_name = None, compress = False):
+    """
+    Converts an old text save file into a binary one
+    """
+    if new_file_name == None:
+        new_file_name = file_name + "_binary"
+    f = open(new_file_name, "wb")
+    for N in load_text_network(file_name):
+        write_network(f, N, compress)
+    f.close()
+    return(new_file_name)
+
 def load_Herd(file_name, size = 100, mc = 0.1, ma = 0.001, nb_tests = 2):
     """
-    Recreate a Herd based on the saved Network
+    Recreate a Herd based on the saved Networks
+    (the members cycle through them if there are less than size)
     """
-    N = load_network(file_name)[0]
-    H = Herd(N.nb_sensors, N.nb_actors, N.nb_add_neurons, N.period, size,
-             mc, ma, nb_tests, weights = N.weights, bias = N.bias)
+    networks = load_network(file_name)
+    N = networks[0]
+    H = Herd(N.nb_sensors, N.nb_actors, N.nb_add_neurons, N.period,
+             N.function, N.reset_after_process, size, mc, ma, nb_tests)
+    H.members = [copy.deepcopy(networks[i%len(networks)])
+                 for i in range(size)]
     return(H)
 
 def load_score(file_name):
     """
-    TO BE REWORKED
+    The best score of each generation of a score file
+    (the other lines, like the reports of the evaluators, are skipped)
     """
     f = open(file_name, "r")
     r = []
-    data = []
-    for i in range(7):
-        data.append(f.readline())
-    nb_generations = int(f.readline()[35:])
-    for i in range(nb_generations):
-        line = f.readline()
-        r.append(float(line[line.index(":") + 2:-2]))
+    for line in f.readlines():
+        if line.startswith("generation n°"):
+            r.append(float(line[line.index(":") + 2:-2]))
+    f.close()
     return(r)
 
 # Misc functions
@@ -124,6 +339,15 @@ def date():
     t = time.localtime()
     return("_{}_{}_{}_{}_{}".format(t[0], t[1], t[2], t[3], t[4]))
 
+herd_numbers = itertools.count()
+
+def unique_date():
+    """
+    date() followed by the pid and a number of this process, so that Herds
+    started in the same minute do not write in the same files
+    """
+    return(date() + "_{}_{}".format(os.getpid(), next(herd_numbers)))
+
 def under_diag(size):
     matrix = np.zeros((size, size))
     for i in range(size-1):
@@ -139,7 +363,12 @@ def maxindex(array):
 class Problem(object):
     """
     The frame of any "live" problem
+    random is the generator the Problem draws from (np.random unless it is
+    given a RandomState of its own, see Thread_Evaluator), score_tests
+    seeds it
     """
+    random = np.random
+
     def __init__(self, do_run_display = False, do_end_display = False):
         self.do_run_display = do_run_display
         self.do_end_display = do_end_display
@@ -155,15 +384,27 @@ class Problem(object):
         """
         print("Warning  : experience was not fully configured")
         while not self.end_condition():
-            output = Network.process(self.state())
-            self.action(output)
-            if self.do_run_display:
-                self.run_display()
-        self.score_update()
-        score = self.score
+            self.step(Network.process(self.state()))
+        score = self.final_score()
         self.reset()
         return(score)
 
+    def step(self, output):
+        """
+        What happens once the Network gave its output (Scalar_Batch steps
+        the Problem with it)
+        """
+        self.action(output)
+        if self.do_run_display:
+            self.run_display()
+
+    def final_score(self):
+        """
+        The score of the experience once end_condition is met
+        """
+        self.score_update()
+        return(self.score)
+
     def end_condition(self):
         """
         True if the Problem is finished for whatever reason
@@ -229,6 +470,243 @@ class Problem(object):
         pass
 
 
+class Batch_Problem(object):
+    """
+    The frame of a problem that runs nb_episodes episodes at once, one per
+    member of a Population (see Herd.batch_performances)
+    start(nb_episodes) begins the episodes, then at each step
+        state() returns an array (nb_episodes, nb_sensors)
+        action(output) gets an array (nb_episodes, nb_actors)
+    until every episode is done (done is a mask of the finished ones)
+    The finished episodes are masked out : action must leave them (and
+    their score) as they are, whatever their rows of output
+    score holds the score of every episode
+    """
+    def __init__(self):
+        self.nb_sensors = 1
+        self.nb_actors = 1
+        self.done = np.zeros((0), dtype=bool)
+        self.score = np.zeros((0))
+        print("Warning  : __init__ was not fully configured")
+
+    def batch_experience(self, Population):
+        """
+        Computes the actions of every member of the Population on its
+        episode, returns their scores
+        """
+        self.start(Population.size)
+        while not self.end_condition():
+            self.action(Population.process(self.state()))
+        return(np.array(self.score, dtype=float))
+
+    def start(self, nb_episodes):
+        """
+        Begins nb_episodes episodes
+        """
+        print("Warning  : start was not fully configured")
+        self.done = np.ones((nb_episodes), dtype=bool)
+        self.score = np.zeros((nb_episodes))
+
+    def end_condition(self):
+        return(bool(np.all(self.done)))
+
+    def state(self):
+        """
+        Returns the state of every episode
+        """
+        print("Warning  : state was not fully configured")
+        return(np.ones((len(self.done), self.nb_sensors)))
+
+    def action(self, output):
+        """
+        Computes the consequences of the outputs on the running episodes
+        """
+        print("Warning  : action was not fully configured")
+
+    def __name__(self):
+        return("An_Unnamed_Batch_Problem")
+
+
+class Scalar_Batch(Batch_Problem):
+    """
+    Runs a scalar Problem as a Batch_Problem : every episode is a copy of
+    the Problem, stepped in a plain loop the way Problem.experience does
+    (state, step(output) until end_condition, then final_score), the
+    experience of the Problem itself is not called
+    A Problem without step or final_score is stepped with action(output)
+    (and run_display if do_run_display) and scored with score_update then
+    score, like Problem does
+    A Problem with its own experience and no step to go with it cannot be
+    stepped (see steppable) : ValueError, Herd.evolve keeps it scalar
+    The episodes are stepped in order so they draw from the numpy random
+    generator in the same order at every run
+    The other attributes are the ones of the Problem
+    """
+    def __init__(self, problem):
+        if not steppable(problem):
+            raise(ValueError(
+                "{} has its own experience and no step, it cannot run in "
+                "a Scalar_Batch".format(type(problem).__name__)))
+        self.problem = problem
+        self.done = np.zeros((0), dtype=bool)
+        self.score = np.zeros((0))
+
+    def start(self, nb_episodes):
+        self.problems = [copy.deepcopy(self.problem)
+                         for i in range(nb_episodes)]
+        self.done = np.zeros((nb_episodes), dtype=bool)
+        self.score = np.zeros((nb_episodes))
+        for i, problem in enumerate(self.problems):
+            problem.reset()
+            self.check_end(i)
+
+    def check_end(self, i):
+        problem = self.problems[i]
+        if not problem.end_condition():
+            return
+        if hasattr(problem, "final_score"):
+            self.score[i] = problem.final_score()
+        else:
+            problem.score_update()
+            self.score[i] = problem.score
+        self.done[i] = True
+
+    def state(self):
+        inputs = np.zeros((len(self.done), self.problem.nb_sensors))
+        for i in np.nonzero(~self.done)[0]:
+            inputs[i] = self.problems[i].state()
+        return(inputs)
+
+    def action(self, output):
+        for i in np.nonzero(~self.done)[0]:
+            problem = self.problems[i]
+            if hasattr(problem, "step"):
+                problem.step(np.array(output[i]))
+            else:
+                problem.action(np.array(output[i]))
+                if getattr(problem, "do_run_display", False):
+                    problem.run_display()
+            self.check_end(i)
+
+    def __getattr__(self, name):
+        if name == "problem":
+            raise(AttributeError(name))
+        return(getattr(self.problem, name))
+
+    def __name__(self):
+        return(self.problem.__name__())
+
+
+def steppable(problem):
+    """
+    True if Scalar_Batch can step problem : its experience is the loop of
+    Problem.experience, or it has a step of its own to go with its own
+    experience (like Car)
+    Classifier, Optimization, GAN or MNIST run their own loop in experience
+    """
+    experience = getattr(type(problem), "experience", None)
+    if experience == None or experience is Problem.experience:
+        return(True)
+    step = getattr(type(problem), "step", None)
+    return(step != None and step is not Problem.step)
+
+
+def score_tests(problem, member, seeds):
+    """
+    The mean score of member over one test per seed, every evaluator tests
+    this way : seed (of the random of the Problem, see Problem), reset of
+    the Problem and of the Network, experience
+    """
+    random = getattr(problem, "random", np.random)
+    score = 0
+    for seed in seeds:
+        random.seed(seed)
+        problem.reset()
+        member.reset()
+        score += problem.experience(member)
+    return(score/len(seeds))
+
+
+class Evaluator(object):
+    """
+    What computes the scores of the members of a Herd on its Problem
+    start is called at the beginning of Herd.evolve and stop at its end
+    evaluate returns the mean score of each member over nb_tests tests, the
+    test i of the member index is seeded with
+    random_seed(run, generation, index, i)
+    reproduce makes the new generation from the parents chosen by
+    Herd.reproduce, Evaluators that hold the members make it themselves
+    report is written in the score file after each generation
+    submit and result evaluate Networks one by one for the steady state
+    evolution : result gives back (Network, score) of any submitted Network
+    (here the first one, evaluated only then)
+    budget (a Thread_Budget) gives the layout of workers and threads
+    nb_workers is the number of members evaluated at once once started
+    (None or 0 when it is not known)
+    """
+    budget = None
+    nb_workers = 1
+
+    def plan(self, Herd, nb_workers = None, max_workers = None):
+        """
+        Returns the layout (nb_workers, nb_threads) of the evaluation
+        """
+        if self.budget == None:
+            self.budget = Thread_Budget()
+        return(self.budget.layout(Herd.members[0].nb_neurons, nb_workers,
+                                  max_workers))
+
+    def start(self, Herd):
+        pass
+
+    def submit(self, Herd, member, seeds):
+        if not hasattr(self, "submitted"):
+            self.submitted = []
+        self.submitted.append((Herd, member, seeds))
+
+    def result(self):
+        Herd, member, seeds = self.submitted.pop(0)
+        return(member, score_tests(Herd.Problem, member, seeds))
+
+    def evaluate(self, Herd):
+        raise(NotImplementedError)
+
+    def reproduce(self, Herd, parents):
+        """
+        The children of parents (indexes of members), the whole generation
+        mutated at once by Herd.mutation
+        """
+        population = Population(Herd.members)
+        population.select(parents)
+        population.mutate(Herd.mutation_coefficent, Herd.mutation_amplitude,
+                          Herd.mutation,
+                          Counter_Random(Herd.run, Herd.generation,
+                                         stream=MUTATION_STREAM))
+        Herd.members = population.networks()
+
+    def stop(self, Herd):
+        pass
+
+    def report(self):
+        if self.budget == None:
+            return("")
+        return(self.budget.report())
+
+
+class Serial_Evaluator(Evaluator):
+    """
+    Every test of every member one after the other in this process
+    BLAS keeps all its threads for the matmul of the batched Networks
+    """
+    def evaluate(self, Herd):
+        return(np.array([
+            score_tests(Herd.Problem, member,
+                       [random_seed(Herd.run, Herd.generation, index, i)
+                        for i in range(Herd.nb_tests)])
+            for index, member in enumerate(Herd.members)
+        ]))
+
+
 class Herd(object):
     """
     Herd of networks that evolve by reproducing
@@ -246,6 +724,12 @@ class Herd(object):
         mutation_amplitude = 0.001,
         nb_tests = 1,
         do_display = False,
+        mutation = gaussian_mutation,
+        archive_top = 1,
+        population = None,
+        run = None,
+        evaluator = None,
+        batch = False,
         **kwargs
     ):
         self.nb_sensors = nb_sensors
@@ -257,11 +741,30 @@ class Herd(object):
         self.size = size
         self.mutation_coefficent = mutation_coefficent
         self.mutation_amplitude = mutation_amplitude
+        self.mutation = mutation
+        self.archive_top = archive_top
+        self.archive = None
+        if population is None:
+            population = Population
+        self.population = population
+        if run is None:
+            run = new_run()
+        self.run = run
+        self.generation = 0
+        if evaluator is None:
+            evaluator = Serial_Evaluator()
+        self.evaluator = evaluator
+        # Scalar Problems evolve through Scalar_Batch too (the ones that
+        # can be stepped, see steppable)
+        self.batch = batch
+        # Called with the Herd after each generation is saved, before its
+        # reproduction (see Islands.Migration)
+        self.migration = None
         self.nb_tests = nb_tests
         self.do_display = do_display
         self.make_members(kwargs)
         self.array_scores = []
-        self.date = date()
+        self.date = unique_date()
         self.max_score = 0
         self.max_score_index = 0
 
@@ -273,17 +776,21 @@ class Herd(object):
             for i in range(self.size)
         ]
 
-    def evolve(self, problem, nb_generations=1):
+    def evolve(self, problem, nb_generations=1, steady=False):
         """
         The idea is to make the AI evolve by aproximating the gradient descent
         Opens and closes the score output file multiple times so that it's
         possible to see what's going on in during the training
+        steady = True evolves without generations (see steady_state)
         """
         if problem == None:
             # The empty problem, just here for quick tests
             self.Problem = Problem()
         else:
             self.Problem = problem
+        if (self.batch and not hasattr(self.Problem, "batch_experience")
+                and steppable(self.Problem)):
+            self.Problem = Scalar_Batch(self.Problem)
         score_file = open(self.Problem.__name__() + "_score" + self.date, "w")
         score_file.write(
             "score\n"
@@ -296,57 +803,159 @@ class Herd(object):
             + "number of generations to proceed : {}\n".format(nb_generations)
         )
         score_file.close()
-        for generation in range(nb_generations):
-            # Evaluation of performances
-            proba_reproduction = self.performances()
-            # Reproduction (with mutation) of Networks
-            self.reproduce(proba_reproduction)
-            # Saves the scores
-            self.max_score = max(self.score)
-            self.max_score_index = list(self.score).index(self.max_score)
-            self.array_scores.append(self.max_score)
-            # Saves one Network and the score evolution
-            self.members[self.max_score_index].save(
-                self.Problem.__name__() + "_Network" + self.date, "w", False)
-            score_file = open(
-                self.Problem.__name__() + "_score" + self.date, "a"
-            )
-            score_file.write(
-                "generation n° {} : {} \n".format(
-                    generation, str(self.max_score)))
-            score_file.close()
+        self.evaluator.start(self)
+        # The workers, threads and shared memory of the evaluator are freed
+        # even if the evolution fails
+        try:
+            if steady:
+                self.steady_state(nb_generations)
+            for generation in range(nb_generations*(not steady)):
+                # Evaluation of performances
+                proba_reproduction = self.performances()
+                # Saves the scores and the best Networks before they reproduce
+                self.save_generation(generation)
+                # Exchange of members with other Herds
+                if self.migration != None:
+                    self.migration(self)
+                    proba_reproduction = self.modif_score(self.score)
+                # Reproduction (with mutation) of Networks
+                self.reproduce(proba_reproduction)
+                self.generation += 1
+        finally:
+            self.evaluator.stop(self)
         score_file = open(self.Problem.__name__() + "_score" + self.date, "a")
         score_file.write("End\n")
-        if self.Problem.do_end_display:
+        if getattr(self.Problem, "do_end_display", False):
             self.Problem.end_display()
         score_file.close()
         return(self.array_scores)
 
+    def steady_state(self, nb_generations):
+        """
+        Asynchronous evolution : as soon as a child is evaluated it replaces
+        the worst member and a new child of the members (chosen like
+        reproduce does) is sent to the evaluator, so nothing waits for the
+        slowest test
+        The first generation is the evaluation of the members, then every
+        size evaluated children make a generation, saved as evolve does
+        """
+        if hasattr(self.Problem, "batch_experience"):
+            raise(ValueError("Batch Problems evolve by generations"))
+        self.score = np.array(self.evaluator.evaluate(self), dtype=float)
+        self.members = list(self.members)
+        self.save_generation(self.generation)
+        self.generation += 1
+        nb_children = (nb_generations - 1)*self.size
+        nb_born = 0
+        nb_evaluated = 0
+        for i in range(min(2*max(1, self.evaluator.nb_workers or 1),
+                           nb_children)):
+            self.give_birth(nb_born)
+            nb_born += 1
+        while nb_evaluated < nb_children:
+            child, score = self.evaluator.result()
+            nb_evaluated += 1
+            worst = np.argmin(self.score)
+            self.members[worst] = child
+            self.score[worst] = score
+            if nb_born < nb_children:
+                self.give_birth(nb_born)
+                nb_born += 1
+            if nb_evaluated%self.size == 0:
+                self.save_generation(self.generation)
+                self.generation += 1
+
+    def give_birth(self, birth):
+        """
+        Sends a mutated copy of a member to the evaluator, birth is the
+        number of the child (it addresses its randomness)
+        """
+        parent = Counter_Random(self.run, self.generation, member=birth,
+                                stream=SELECTION_STREAM).choice(
+                                    self.size, p=self.modif_score(self.score))
+        child = copy.deepcopy(self.members[int(parent)]).mutate(
+            self.mutation_coefficent, self.mutation_amplitude, self.mutation,
+            Counter_Random(self.run, self.generation, member=birth,
+                           stream=MUTATION_STREAM))
+        self.evaluator.submit(
+            self, child,
+            [random_seed(self.run, self.generation, birth, i)
+             for i in range(self.nb_tests)])
+
+    def save_generation(self, generation):
+        """
+        Saves the score, the champion and archives the archive_top best
+        members (the whole history stays in the archive)
+        """
+        self.max_score = max(self.score)
+        self.max_score_index = list(self.score).index(self.max_score)
+        self.array_scores.append(self.max_score)
+        # Saves one Network and the score evolution
+        self.members[self.max_score_index].save(
+            self.Problem.__name__() + "_Network" + self.date, "w", False)
+        if self.archive_top > 0:
+            if self.archive is None:
+                self.archive = Archive(
+                    self.Problem.__name__() + "_Archive" + self.date)
+            ranking = np.argsort(self.score)[::-1][:self.archive_top]
+            self.archive.append(
+                [self.members[i] for i in ranking],
+                [self.score[i] for i in ranking],
+                len(self.array_scores) - 1
+            )
+        score_file = open(
+            self.Problem.__name__() + "_score" + self.date, "a"
+        )
+        score_file.write(
+            "generation n° {} : {} \n".format(
+                generation, str(self.max_score)))
+        report = self.evaluator.report()
+        if report != "":
+            score_file.write(report + "\n")
+        score_file.close()
+
     def performances(self):
         """
         Evaluates performances then normalises them for probability operations
+        Problems that can present one observation per member at once (they
+        have a batch_experience method, like Batch_Problems) drive the whole
+        Herd as a Population, with batch = True the other ones too (through
+        Scalar_Batch) unless they run their own loop in experience
         """
+        if hasattr(self.Problem, "batch_experience"):
+            return(self.batch_performances())
+        self.score = self.evaluator.evaluate(self)
+        score_modif = self.modif_score(self.score)
+        return(score_modif)
+
+    def batch_performances(self):
+        """
+        Evaluates every member at once through a Population (of class
+        self.population, Native_Population to iterate them in C)
+        batch_experience must return one score per member
+        """
+        population = self.population(self.members)
         self.score = np.zeros(self.size)
-        for index, member in enumerate(self.members):
-            member_score = 0
-            for i in range(self.nb_tests):
-                member_score += self.Problem.experience(member)
-                member.reset()
-            member_score /= self.nb_tests
-            self.score[index] = member_score
+        for i in range(self.nb_tests):
+            np.random.seed(random_seed(self.run, self.generation, ALL_MEMBERS,
+                                       i))
+            self.score += self.Problem.batch_experience(population)
+            population.reset()
+        self.score /= self.nb_tests
         score_modif = self.modif_score(self.score)
         return(score_modif)
 
     def reproduce(self, proba_reproduction):
         """
-        The copy of the successful networks with mutation
+        The copy of the successful networks with mutation, made by the
+        evaluator (see Evaluator.reproduce)
+        The randomness comes from (run, generation) only, so an evaluator
+        that reproduces the members itself makes the same children
         """
-        new_members = [copy.deepcopy(np.random.choice(
-                        self.members, p=proba_reproduction))
-                        for i in range(self.size)]
-        for member in new_members:
-            member.mutate(self.mutation_coefficent, self.mutation_amplitude)
-        self.members = new_members
+        selection = Counter_Random(self.run, self.generation,
+                                   stream=SELECTION_STREAM)
+        parents = selection.choice(self.size, self.size, p=proba_reproduction)
+        self.evaluator.reproduce(self, parents)
 
     def modif_score(self, score):
         """
@@ -361,6 +970,20 @@ class Herd(object):
             score = np.ones(self.size)
         return(score/sum(score))
 
+    def save(self, file_name = None, add_date = True, compress = False):
+        """
+        Saves every member of the Herd into one binary file
+        load_Herd gets them back
+        """
+        if file_name == None:
+            file_name = "Herd"
+        if add_date:
+            file_name += self.date
+        f = open(file_name, "wb")
+        for member in self.members:
+            write_network(f, member, compress)
+        f.close()
+
     def scale(self, reproductive_members):
         """
         NOT USED YET
@@ -408,7 +1031,7 @@ class Network(object):
         period = 1,
         function = segments,
         reset_after_process = True,
-        **kwargs # "weights", "bias", "slices", "regions"
+        **kwargs # "weights", "bias", "slices", "regions", "buffered"
     ):
         self.nb_sensors = nb_sensors
         self.nb_actors = nb_actors
@@ -421,6 +1044,7 @@ class Network(object):
         if ("slices" in kwargs and "regions" in kwargs):
             # slices = list of size of groups of deep neurons
             # regions = array of 0 and 1 if the group shall exist
+            # only the existing groups are stored (see Blocks)
             self.slices = kwargs["slices"]
             self.regions = kwargs["regions"]
             self.squared()
@@ -432,10 +1056,35 @@ class Network(object):
         ):
             self.weights = kwargs["weights"]
             self.bias = kwargs["bias"]
+            if isinstance(self.weights, Blocks):
+                self.slices = self.weights.slices
+                self.regions = self.weights.regions
+                self.slices_sum = self.weights.slices_sum
         else :
             raise(ValueError("Input matrices do not have the right format\
                     or both weights and bias or both slices and \
                     regions must be entered"))
+        # A buffered Network does not allocate anything while processing
+        self.buffered = kwargs.get("buffered", False)
+        if self.buffered:
+            self.allocate_buffers()
+
+    def allocate_buffers(self):
+        """
+        Preallocates the work arrays of the buffered mode
+        values goes back and forth between the two ping-pong buffers
+        (tests/test_network.py checks with tracemalloc that processing
+        allocates nothing)
+        """
+        self.ping_pong = [np.zeros((self.nb_neurons)),
+                          np.zeros((self.nb_neurons))]
+        self.ping_pong[0][:] = self.values
+        self.values = self.ping_pong[0]
+        self.work = np.zeros((self.nb_neurons))
+        self.output_buffer = np.zeros((self.nb_actors))
+        self.in_place = "out" in inspect.signature(self.function).parameters
+        if isinstance(self.weights, Blocks):
+            self.weights.allocate_buffers()
 
     def random_set_up(self):
         self.weights = (
@@ -445,27 +1094,10 @@ class Network(object):
         self.bias = np.random.rand(self.nb_neurons) - 0.5
 
     def squared(self):
-        self.directive = [[0]*len(self.slices)]*len(self.slices)
-        self.slices_sum = [0]
-        for i in self.slices:
-            self.slices_sum.append(self.slices_sum[-1] + i)
-        self.weights = np.zeros((self.nb_neurons, self.nb_neurons))
-        l = len(self.slices)
-        for indice_i, i in enumerate(range(l)):
-            for indice_j, j in enumerate(range(l)):
-                self.weights[
-                    self.slices_sum[i]:self.slices_sum[i + 1],
-                    self.slices_sum[j]:self.slices_sum[j + 1]
-                ] = (
-                    self.regions[i][j]
-                    * (
-                        np.random.rand(
-                            self.slices[indice_i],
-                            self.slices[indice_j]
-                        )
-                        - 0.5
-                    )
-                )
+        self.weights = Blocks(self.slices, self.regions)
+        self.slices_sum = self.weights.slices_sum
+        for (i, j), block in zip(self.weights.living, self.weights.arrays):
+            block[:] = self.regions[i][j]*(np.random.rand(*block.shape) - 0.5)
         self.bias = np.random.rand(self.nb_neurons) - 0.5
 
     def process(self, input_data, nb_iterations=1):
@@ -484,19 +1116,48 @@ class Network(object):
         self.values[:self.nb_sensors] += values_inputs
 
     def output(self):
+        """
+        In buffered mode the output is a buffer that will be overwritten
+        by the next process
+        """
+        if self.buffered:
+            np.copyto(self.output_buffer, self.values[-self.nb_actors:])
+            return(self.output_buffer)
         return(self.values[-self.nb_actors:])
 
     def iteration(self):
         """
         We iterate once and update network state
         """
-        self.values = self.function(
-            np.matmul(self.weights, self.values + self.bias))
+        if self.buffered:
+            self.buffered_iteration()
+            return
+        self.values = self.function(self.weights @ (self.values + self.bias))
         # Old way of doing, I'm testing this new one on top
         # I order to be able to make "dead connections"
         #self.values = self.function(
         #   np.matmul(self.weights, self.values) + self.bias)
 
+    def buffered_iteration(self):
+        """
+        Same as iteration but the result goes into the other ping-pong buffer
+        """
+        np.add(self.values, self.bias, out=self.work)
+        if self.values is self.ping_pong[0]:
+            new_values = self.ping_pong[1]
+        else:
+            new_values = self.ping_pong[0]
+        if isinstance(self.weights, Blocks):
+            self.weights.matmul(self.work, new_values)
+        else:
+            np.matmul(self.weights, self.work, out=new_values)
+        if self.in_place:
+            self.function(new_values, out=new_values)
+        else:
+            # Only the activations without out allocate
+            new_values[:] = self.function(new_values)
+        self.values = new_values
+
     def add_neurons(self, add_neurons=1):
         """
         NOT USED YET
@@ -531,36 +1192,60 @@ class Network(object):
         # Returns the new number of nerons
         return(self.nb_neurons)
 
-    def mutate(self, mutation_coefficent, mutation_amplitude):
+    def genome(self):
+        """
+        All the parameters of the Network in one flat array [weights, bias]
+        Only the living weights are in it if the Network is sliced
+        """
+        if isinstance(self.weights, Blocks):
+            return(np.concatenate((self.weights.data, self.bias)))
+        return(np.concatenate((self.weights.ravel(), self.bias)))
+
+    def set_genome(self, genome):
+        if isinstance(self.weights, Blocks):
+            self.weights.data[:] = genome[:self.weights.size]
+        else:
+            self.weights[:] = genome[:self.nb_neurons**2].reshape(
+                (self.nb_neurons, self.nb_neurons))
+        self.bias[:] = genome[-self.nb_neurons:]
+
+    def genes_neurons(self):
+        """
+        The neuron each gene of the genome belongs to
+        """
+        if isinstance(self.weights, Blocks):
+            weights_neurons = self.weights.rows()
+        else:
+            weights_neurons = np.repeat(np.arange(self.nb_neurons),
+                                        self.nb_neurons)
+        return(np.concatenate((weights_neurons, np.arange(self.nb_neurons))))
+
+    def mutate(self, mutation_coefficent, mutation_amplitude,
+               mutation = gaussian_mutation, rng = None):
         """
         Return the mutated Network
         """
-        np.random.seed() # For multiprocressing
-        for i in range(self.nb_neurons*(self.nb_neurons + 1)):
-            # If there is a mutation
-            if np.random.choice(
-                [True, False],
-                p = [mutation_coefficent, 1 - mutation_coefficent]
-            ):
-                # If the iterator corresponds to a weight, we modify it
-                if i < self.nb_neurons**2:
-                    self.weights[i//self.nb_neurons][i%self.nb_neurons] += (
-                        np.random.normal(0, mutation_amplitude)
-                    )
-                # Elsif it corresponds to a bias we modify it
-                elif i < self.nb_neurons*(self.nb_neurons + 1):
-                    self.bias[i - self.nb_neurons**2] += (
-                        np.random.normal(0, mutation_amplitude)
-                    )
-
-    def save(self, file_name = None, mode = "a", add_date = True):
+        genome = self.genome()[None]
+        mutation(genome, self.genes_neurons(), mutation_coefficent,
+                 mutation_amplitude, rng)
+        self.set_genome(genome[0])
+        return(self)
+
+    def save(self, file_name = None, mode = "a", add_date = True,
+             binary = True, compress = False):
         """
         Saves the Network into a file
+        binary = False writes the old text format (one float per line)
         """
         if file_name == None:
             file_name = "NDNN"
         if add_date:
             file_name += date()
+        if binary:
+            f = open(file_name, mode + "b")
+            write_network(f, self, compress)
+            f.close()
+            return
         f = open(file_name, mode)
         f.write(
             "Network\n"
@@ -578,186 +1263,63 @@ class Network(object):
             f.write(str(i) + "\n")
         f.close()
 
-    def compile(self, c_code_name = None, add_date = False, save_exe = False):
+    def compile(self, c_code_name = None, add_date = False, save_exe = False,
+                target = "executable", nb_iterations = 1, io = "text",
+                specialize = True, flags = None, cache = None,
+                quantize = None):
         """
         Saves a compiled and usable c version of the Network,
         this is intended to be the final thing to do before using the Network
         in its application
+        target = "executable" : a program used with streams of input and
+            output, save_exe keeps the C code
+            io = "binary" makes it read and write binary frames of doubles
+            instead of lines of text (see stream_process)
+        specialize = True generates code for this very Network (dead blocks
+        and zero weights skipped, weights as constants) compiled with
+        optimization flags, False the generic code without flags, to
+        compare them
+        target = "shared" : a shared library to use with
+            Compiled_Network(file_name), doing nb_iterations per process
+            unless its process is given another nb_iterations
+        cache : a Compile_Cache, the Network is then only compiled if it is
+        not already in it (c_code_name, add_date and save_exe are not used)
+        and compile waits for the compiler (Compile_Cache.compile gives the
+        Compilation running in the background)
+        quantize : a trace of inputs (one row per process), the code then
+        computes in integers (int8 weights, int16 values, see Quantization)
+        with scales calibrated on the trace, and the error of the compiled
+        file against the Network on the trace is kept in quantized_error
+        (max, mean of the absolute differences of the outputs)
+        (only segments, ramp and threshold can be quantized)
+        Returns the name of the compiled file
         """
-        if c_code_name == None:
-            c_code_name = "Exe"
-        c_code_name += date() * add_date
-        string_values = "{"
-        for i in self.values:
-            string_values += str(i) + ", "
-        string_values = string_values[:-2]
-        string_values += "}"
-        string_bias = "{"
-        for i in self.bias:
-            string_bias += str(i) + ", "
-        string_bias = string_bias[:-2]
-        string_bias += "}"
-        string_weights = "{"
-        for i in self.weights:
-            string_weights += "{"
-            for j in i:
-                    string_weights += str(j) + ", "
-            string_weights = string_weights[:-2]
-            string_weights+="}, "
-        string_weights = string_weights[:-2]
-        string_weights += "}"
-
-        string_format_input = (self.nb_sensors*"%lf ")[:-1]
-        string_input = ""
-        for i in range(self.nb_sensors):
-            string_input += "&values2[{}], ".format(i)
-        string_input = string_input[:-2]
-        string_format_output = (self.nb_actors*"%lf ")[:-1]
-        string_output = ""
-        for i in range(self.nb_actors):
-            string_output += "N.values[NB_SENSORS + NB_ACTORS + {}], ".format(i)
-        string_output = string_output[:-2]
-
-        c_code = (
-            """#include <stdio.h> //\n"""
-            + """#include <stdlib.h> //\n"""
-            + """#include <math.h>\n"""
-            + """\n"""
-            + """#define NB_SENSORS {}\n""".format(self.nb_sensors)
-            + """#define NB_ACTORS {}\n""".format(self.nb_actors)
-            + """#define NB_ADD_NEURONS {}\n""".format(self.nb_add_neurons)
-            + """#define PERIOD {}\n""".format(self.period)
-            + """#define FUNCTION {}\n""".format(self.function.__name__)
-            + """#define VALUES {}\n""".format(string_values)
-            + """#define BIAS {}\n""".format(string_bias)
-            + """#define WEIGHTS {}\n""".format(string_weights)
-            + """#define NB_TOTAL_NEURONS NB_SENSORS + NB_ADD_NEURONS"""
-                + """ + NB_ACTORS\n"""
-            + """\n"""
-            + """typedef struct Network\n"""
-            + """{\n"""
-            + """    float values[NB_TOTAL_NEURONS];\n"""
-            + """    float bias[NB_TOTAL_NEURONS];\n"""
-            + """    float weights[NB_TOTAL_NEURONS][NB_TOTAL_NEURONS];\n"""
-            + """}\n"""
-            + """Network;\n"""
-            + """\n"""
-            + """float sigmoid(float x)\n"""
-            + """{\n"""
-            + """    float r;\n"""
-            + """    r = -1 + (2/(1+exp(-x)));\n"""
-            + """    return r;\n"""
-            + """}\n"""
-            + """\n"""
-            + """float ramp(float x)\n"""
-            + """{\n"""
-            + """    if (x>0)\n"""
-            + """    {\n"""
-            + """        return x;\n"""
-            + """    }\n"""
-            + """    else\n"""
-            + """    {\n"""
-            + """        return 0;\n"""
-            + """    }\n"""
-            + """}\n"""
-            + """\n"""
-            + """float segments(float x)\n"""
-            + """{\n"""
-            + """   if (x>1)\n"""
-            + """    {\n"""
-            + """        return 1;\n"""
-            + """    }\n"""
-            + """   if (x<-1)\n"""
-            + """    {\n"""
-            + """        return -1;\n"""
-            + """    }\n"""
-            + """ return x;\n"""
-            + """}\n"""
-            + """\n"""
-            + """void iteration(Network *N)\n"""
-            + """{\n"""
-            + """    float values2[NB_TOTAL_NEURONS];\n"""
-            + """    int i;\n"""
-            + """    int j;\n"""
-            + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
-            + """    {\n"""
-            + """        values2[i] = 0;\n"""
-            + """    }\n"""
-            + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
-            + """    {\n"""
-            + """        for (j=0; j<NB_TOTAL_NEURONS; j++)\n"""
-            + """        {\n"""
-            + """            values2[j]+=N->weights[j][i]*(N->bias[i]+"""
-                + """N->values[i]);\n"""
-            + """        }\n"""
-            + """    }\n"""
-            + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
-            + """    {\n"""
-            + """        N->values[i] = FUNCTION(values2[i]);\n"""
-            + """    }\n"""
-            + """}\n"""
-            + """\n"""
-            + """int main(int argc, char * argv[])\n"""
-            + """{\n"""
-            + """    if (argc != 3)\n"""
-            + """    {\n"""
-            + """        printf("Use format : input_file output_file\\n");\n"""
-            + """        return 1;\n"""
-            + """    }\n"""
-            + """    Network N = {\n"""
-            + """    VALUES,\n"""
-            + """    BIAS,\n"""
-            + """    WEIGHTS,\n"""
-            + """    };\n"""
-            + """    float values2[NB_TOTAL_NEURONS];\n"""
-            + """    FILE *input_file;\n"""
-            + """    input_file = fopen(argv[1], "r");\n"""
-            + """    if (input_file == NULL)\n"""
-            + """    {\n"""
-            + """        perror("input_file opening");\n"""
-            + """        return 1;\n"""
-            + """    }\n"""
-            + """    FILE *output_file;\n"""
-            + """    output_file = fopen(argv[2], "w");\n"""
-            + """\n"""
-            + """    if (output_file == NULL)\n"""
-            + """    {\n"""
-            + """        perror("output_file opening");\n"""
-            + """        fclose(input_file);\n"""
-            + """        return 1;\n"""
-            + """    }\n"""
-            + """    int i;\n"""
-            + """    while (fscanf(input_file, "{}\\n", {}))\n""".format(
-                string_format_input, string_input)
-            + """    {\n"""
-            + """        // input\n"""
-            + """        for (i=0; i<NB_SENSORS; i++)\n"""
-            + """        {\n"""
-            + """            N.values[i] += values2[i];\n"""
-            + """        }\n"""
-            + """        // process\n"""
-            + """        for (i=0; i<PERIOD; i++)\n"""
-            + """        {\n"""
-            + """            iteration(&N);\n"""
-            + """        }\n"""
-            + """        // output\n"""
-            + """        fprintf(output_file, "{}\\n", {});\n""".format(
-                string_format_output, string_output)
-            + """    }\n"""
-            + """    fclose(output_file);\n"""
-            + """    fclose(input_file);\n"""
-            + """    return 0;\n"""
-            + """}\n"""
-            )
-        f = open(c_code_name + ".c", "w")
-        f.write(c_code)
-        f.close()
-        os.system("gcc -o {} {} -lm".format(c_code_name, c_code_name + ".c"))
-        if not save_exe:
-            os.system("rm {}".format(c_code_name + ".c"))
+        if cache != None:
+            file_name = cache.compile(self, target, nb_iterations, io,
+                                      specialize, flags, quantize).result()
+        else:
+            if c_code_name == None:
+                c_code_name = "Exe"
+            c_code_name += date() * add_date
+            if target == "shared":
+                c_code_name += ".so"
+            if flags == None:
+                flags = default_flags(specialize)
+            file_name = compile_c(
+                network_code(self, target, nb_iterations, io, specialize,
+                             quantize),
+                c_code_name, shared=(target == "shared"), save_c=save_exe,
+                flags=flags)
+        if quantize is not None:
+            self.quantized_error = quantization_error(
+                self, file_name, quantize, target, nb_iterations, io)
+        return(file_name)
 
     def reset(self):
-        self.values = np.zeros(self.values.shape)
+        if self.buffered:
+            self.values.fill(0)
+        else:
+            self.values = np.zeros(self.values.shape)
 
     def display_console(self):
         print("neurons : {}\n".format(self.nb_neurons)
@@ -800,6 +1362,375 @@ class Network(object):
         plt.show()
 
 
+class Blocks(object):
+    """
+    The weights of a sliced Network
+    Only the blocks of the regions that exist are stored, one after the
+    other in data, so memory and computations scale with the living weights
+    data can have leading dimensions (one per member in a Population)
+    When a dense matrix is needed (save, compile, display...) Blocks behave
+    like a numpy array of shape (nb_neurons, nb_neurons)
+    """
+    def __init__(self, slices, regions, data = None):
+        self.slices = list(slices)
+        self.regions = regions
+        self.slices_sum = [0]
+        for i in self.slices:
+            self.slices_sum.append(self.slices_sum[-1] + i)
+        self.nb_neurons = self.slices_sum[-1]
+        l = len(self.slices)
+        self.living = [(i, j) for i in range(l) for j in range(l)
+                       if self.regions[i][j] != 0]
+        self.size = sum([self.slices[i]*self.slices[j]
+                         for i, j in self.living])
+        if data is None:
+            data = np.zeros((self.size))
+        self.data = data
+        self.shape = self.data.shape[:-1] + (self.nb_neurons, self.nb_neurons)
+        self.arrays = []
+        start = 0
+        for i, j in self.living:
+            end = start + self.slices[i]*self.slices[j]
+            self.arrays.append(self.data[..., start:end].reshape(
+                self.data.shape[:-1] + (self.slices[i], self.slices[j])))
+            start = end
+
+    def rows(self):
+        """
+        The row (ie the neuron) of each value of data
+        """
+        return(np.concatenate([
+            np.repeat(np.arange(self.slices_sum[i], self.slices_sum[i + 1]),
+                      self.slices[j])
+            for i, j in self.living
+        ] + [np.zeros((0), dtype=int)]))
+
+    def member(self, index):
+        """
+        The Blocks of one member of a Population
+        """
+        return(Blocks(self.slices, self.regions, self.data[index]))
+
+    def __matmul__(self, vector):
+        """
+        Only the living blocks are multiplied
+        vector has the same leading dimensions as data
+        """
+        result = np.zeros(vector.shape)
+        for (i, j), block in zip(self.living, self.arrays):
+            result[..., self.slices_sum[i]:self.slices_sum[i + 1]] += (
+                np.matmul(
+                    block,
+                    vector[..., self.slices_sum[j]:self.slices_sum[j + 1],
+                           None]
+                )[..., 0]
+            )
+        return(result)
+
+    def allocate_buffers(self):
+        """
+        One buffer per living block for the allocation free matmul
+        """
+        self.buffers = [np.zeros(block.shape[:-1]) for block in self.arrays]
+
+    def matmul(self, vector, out):
+        """
+        Same as @ for a single Network but written in out, using the buffers
+        """
+        out.fill(0)
+        for (i, j), block, buffer in zip(self.living, self.arrays,
+                                         self.buffers):
+            np.matmul(block, vector[self.slices_sum[j]:self.slices_sum[j + 1]],
+                      out=buffer)
+            out[self.slices_sum[i]:self.slices_sum[i + 1]] += buffer
+
+    def dense(self):
+        weights = np.zeros(self.shape)
+        for (i, j), block in zip(self.living, self.arrays):
+            weights[
+                ...,
+                self.slices_sum[i]:self.slices_sum[i + 1],
+                self.slices_sum[j]:self.slices_sum[j + 1]
+            ] = block
+        return(weights)
+
+    def __array__(self, dtype = None, copy = None):
+        if dtype is None:
+            return(self.dense())
+        return(self.dense().astype(dtype))
+
+    def __getitem__(self, key):
+        return(self.dense()[key])
+
+    def __iter__(self):
+        return(iter(self.dense()))
+
+    def __len__(self):
+        return(self.shape[0])
+
+    def __repr__(self):
+        return(repr(self.dense()))
+
+    def __reduce__(self):
+        """
+        Copies and pickles rebuild the arrays as views of the new data
+        (numpy would copy them apart from it)
+        """
+        state = None
+        if hasattr(self, "buffers"):
+            state = {"buffers": self.buffers}
+        return(Blocks, (self.slices, self.regions, self.data), state)
+
+
+class Population(object):
+    """
+    All the members of a Herd stacked together so that they are processed at
+    the same time : one batched matmul per iteration instead of one matmul
+    per Network
+    weights : (size, nb_neurons, nb_neurons)
+    bias and values : (size, nb_neurons)
+    Every member must have the same topology
+    """
+    def __init__(self, members):
+        first = members[0]
+        for member in members:
+            if (
+                member.nb_sensors != first.nb_sensors
+                or member.nb_actors != first.nb_actors
+                or member.nb_neurons != first.nb_neurons
+            ):
+                raise(ValueError("All the members of a Population must have "
+                                 + "the same topology"))
+        self.nb_sensors = first.nb_sensors
+        self.nb_actors = first.nb_actors
+        self.nb_add_neurons = first.nb_add_neurons
+        self.nb_neurons = first.nb_neurons
+        self.period = first.period
+        self.function = first.function
+        self.reset_after_process = first.reset_after_process
+        self.buffered = getattr(first, "buffered", False)
+        self.network_class = type(first)
+        self.slices = None
+        if isinstance(first.weights, Blocks):
+            self.slices = first.weights.slices
+            self.regions = first.weights.regions
+        self.size = len(members)
+        self.neurons = first.genes_neurons()
+        self.genome = np.stack([member.genome() for member in members])
+        self.values = np.stack([member.values for member in members])
+        self.make_views()
+
+    def make_views(self):
+        """
+        weights and bias are views of the genome
+        """
+        nb_weights = self.genome.shape[1] - self.nb_neurons
+        if self.slices is None:
+            self.weights = self.genome[:, :nb_weights].reshape(
+                (self.size, self.nb_neurons, self.nb_neurons))
+        else:
+            self.weights = Blocks(self.slices, self.regions,
+                                  self.genome[:, :nb_weights])
+        self.bias = self.genome[:, nb_weights:]
+
+    def select(self, indexes):
+        """
+        Replaces the members by copies of the members at indexes
+        """
+        self.genome = self.genome[indexes]
+        self.values = self.values[indexes]
+        self.size = len(indexes)
+        self.make_views()
+
+    def mutate(self, mutation_coefficent, mutation_amplitude,
+               mutation = gaussian_mutation, rng = None):
+        """
+        Mutates every member at once
+        """
+        mutation(self.genome, self.neurons, mutation_coefficent,
+                 mutation_amplitude, rng)
+
+    def process(self, input_data, nb_iterations=1):
+        """
+        What the networks do, input_data holds one row of sensors per member
+        and one row of actors per member is returned
+        """
+        self.input(input_data)
+        for i in range(nb_iterations):
+            self.iteration()
+        output = self.output()
+        if self.reset_after_process:
+            self.reset()
+        return(output)
+
+    def input(self, values_inputs):
+        self.values[:, :self.nb_sensors] += values_inputs
+
+    def output(self):
+        return(self.values[:, -self.nb_actors:])
+
+    def iteration(self):
+        """
+        Every member iterates once, in a single batched matmul
+        (one per living block if the members are sliced)
+        """
+        if self.slices is None:
+            self.values = self.function(
+                np.matmul(self.weights, (self.values + self.bias)[:, :, None])
+                [:, :, 0])
+        else:
+            self.values = self.function(
+                self.weights @ (self.values + self.bias))
+
+    def reset(self):
+        self.values = np.zeros(self.values.shape)
+
+    def networks(self):
+        """
+        Unstacks the Population back into a list of Networks
+        """
+        if self.slices is None:
+            weights = [self.weights[i] for i in range(self.size)]
+        else:
+            weights = [self.weights.member(i) for i in range(self.size)]
+        return([
+            self.network_class(
+                self.nb_sensors, self.nb_actors, self.nb_add_neurons,
+                self.period, self.function, self.reset_after_process,
+                weights=weights[i], bias=self.bias[i], buffered=self.buffered)
+            for i in range(self.size)
+        ])
+
+
+class Native_Population(Population):
+    """
+    A Population iterated in C (see Compiler.population_code) : the genomes
+    stay one contiguous buffer and every member advances in its own OpenMP
+    thread, the library is compiled once per topology in cache
+    nb_threads : number of OpenMP threads, OMP_NUM_THREADS if None
+    """
+    def __init__(self, members, cache = None, nb_threads = None):
+        Population.__init__(self, members)
+        self.library = population_library(members[0], cache)
+        if nb_threads != None:
+            self.library.set_nb_threads(nb_threads)
+
+    def process(self, input_data, nb_iterations=1):
+        self.input(input_data)
+        self.iterate(nb_iterations)
+        output = self.output()
+        if self.reset_after_process:
+            self.reset()
+        return(output)
+
+    def iteration(self):
+        self.iterate(1)
+
+    def iterate(self, nb_iterations):
+        """
+        nb_iterations iterations of every member in one call to the library
+        """
+        if not self.genome.flags.c_contiguous:
+            self.genome = np.ascontiguousarray(self.genome)
+            self.make_views()
+        self.values = np.ascontiguousarray(self.values, dtype=np.float64)
+        self.library.population_iteration(self.size, nb_iterations,
+                                          self.genome, self.values)
+
+
+class Archive(object):
+    """
+    An append only file of Networks : a magic "NDNNARCH" then records made of
+    a (generation, rank, score, length) header followed by the length bytes
+    of a binary save record
+    The index of the records is rebuilt by scanning their headers when the
+    archive is opened, a record cut by a crash is dropped (and overwritten
+    by the next append)
+    Any Network is loaded by seeking directly to its record, without
+    reading the others
+    """
+    magic = b"NDNNARCH"
+    record = np.dtype([("generation", "<u4"), ("rank", "<u4"),
+                       ("score", "<f8"), ("length", "<u8")])
+    entry = np.dtype([("generation", "<u4"), ("rank", "<u4"),
+                      ("score", "<f8"), ("offset", "<u8")])
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        if not os.path.exists(file_name):
+            f = open(file_name, "wb")
+            f.write(self.magic)
+            f.close()
+        f = open(file_name, "rb")
+        if f.read(len(self.magic)) != self.magic:
+            f.close()
+            raise(ValueError("{} is not an archive".format(file_name)))
+        size = os.fstat(f.fileno()).st_size
+        entries = []
+        self.end = f.tell()
+        while self.end + self.record.itemsize <= size:
+            header = np.frombuffer(f.read(self.record.itemsize),
+                                   dtype=self.record)[0]
+            offset = self.end + self.record.itemsize
+            if offset + int(header["length"]) > size:
+                break
+            entries.append((header["generation"], header["rank"],
+                            header["score"], offset))
+            self.end = offset + int(header["length"])
+            f.seek(self.end)
+        f.close()
+        self.index = np.array(entries, dtype=self.entry)
+        self.positions = {
+            (int(entry["generation"]), int(entry["rank"])): i
+            for i, entry in enumerate(self.index)
+        }
+
+    def append(self, networks, scores, generation, compress = False):
+        """
+        Adds the networks of a generation, ranked in the given order
+        """
+        f = open(self.file_name, "r+b")
+        f.seek(self.end)
+        f.truncate()
+        entries = []
+        for rank, (N, score) in enumerate(zip(networks, scores)):
+            data = io.BytesIO()
+            write_network(data, N, compress)
+            data = data.getvalue()
+            f.write(np.array((generation, rank, score, len(data)),
+                             dtype=self.record).tobytes())
+            entries.append((generation, rank, score, f.tell()))
+            self.positions[(generation, rank)] = len(self.index) + rank
+            f.write(data)
+        self.end = f.tell()
+        f.close()
+        self.index = np.concatenate(
+            (self.index, np.array(entries, dtype=self.entry)))
+
+    def load(self, generation, rank = 0, mmap = False):
+        """
+        The Network of the given rank at the given generation
+        """
+        if (generation, rank) not in self.positions:
+            raise(KeyError("No Network of rank {} at generation {}".format(
+                rank, generation)))
+        entry = self.index[self.positions[(generation, rank)]]
+        f = open(self.file_name, "rb")
+        f.seek(int(entry["offset"]))
+        N = read_network(f, mmap)
+        f.close()
+        return(N)
+
+    def scores(self, rank = 0):
+        """
+        The score history of the members of the given rank
+        """
+        return(self.index["score"][self.index["rank"] == rank])
+
+    def __len__(self):
+        return(len(self.index))
+
+
 class TestBench(object):
     """
     A test bench to verify everything works fine
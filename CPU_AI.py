@@ -13,6 +13,11 @@ The training is parallelized
 # Necessary
 from AI import *
 import multiprocessing as mp
+from multiprocessing import shared_memory
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 # parallelization functions
@@ -31,25 +36,15 @@ def mean(array, n=1):
         r.append(sum(array[i:i+n])/n)
     return(r)
 
-def prob_reproduction(X):
-    """
-    A weird looking function for parallelization
-    X[0] is a group of objects
-    X[1] is their respective probability of being copied
-    X[2] = mutation_coefficent
-    X[3] = mutation_amplitude
-    returns the mutation of the chosen one
-    """
-    return(np.random.choice(X[0], p=X[1]).mutate(X[2], X[3]))
-
 def evaluate(X):
     """
     Another weird looking function
     X[0] is a problem
     X[1] is a network
+    X[2] is the seed of the test (see Random.random_seed)
     returns the score of the network
     """
-    np.random.seed()
+    np.random.seed(X[2])
     X[0].reset()
     X[1].reset()
     return_value = X[0].experience(X[1])
@@ -63,132 +58,602 @@ def pooled_evolution(X):
     return(r, (X[0].members[0], r))
 
 
-class CPU_Herd(Herd):
+# Workers of a Process_Evaluator
+# Each process builds its Problem and a Network once, tasks only bring genomes
+
+worker_problem = None
+worker_network = None
+
+def worker_start(factory, template):
+    global worker_problem, worker_network
+    worker_problem = factory()
+    worker_network = template
+
+def worker_initialize(budget, counter, initializer, initargs):
     """
-    Herd of networks that evolve by reproducing
+    Applies the Thread_Budget of the worker (workers count themselves with
+    counter) before initializer
+    """
+    with counter.get_lock():
+        index = counter.value
+        counter.value += 1
+    budget.apply(index)
+    initializer(*initargs)
+
+def worker_evaluate(task):
+    """
+    task is (genome, seeds) : the mean score of the genome over one test
+    per seed
+    """
+    genome, seeds = task
+    return(worker_score(genome, seeds))
+
+def worker_score(genome, seeds):
+    worker_network.set_genome(genome)
+    return(score_tests(worker_problem, worker_network, seeds))
+
+
+# Workers of a Shared_Evaluator
+# The genomes are in two shared memory buffers : the members in one, their
+# children are written in the other
+
+worker_blocks = []
+worker_buffers = []
+worker_mutation = None
+
+def worker_start_shared(factory, template, names, shape, mutation):
+    global worker_blocks, worker_buffers, worker_mutation
+    worker_start(factory, template)
+    worker_blocks = [shared_memory.SharedMemory(name=name) for name in names]
+    worker_buffers = [np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+                      for block in worker_blocks]
+    worker_mutation = mutation
+
+def worker_evaluate_shared(task):
+    """
+    task is (buffer, index, seeds)
+    """
+    buffer, index, seeds = task
+    return(worker_score(worker_buffers[buffer][index], seeds))
+
+def worker_unit(task):
+    """
+    task is (buffer, index, test, seed) : one test of one member
+    Returns (index, test, score, duration)
+    """
+    buffer, index, test, seed = task
+    start = time.perf_counter()
+    score = worker_score(worker_buffers[buffer][index], [seed])
+    return(index, test, score, time.perf_counter() - start)
+
+def worker_reproduce(task):
+    """
+    task is (buffer, child, parent, run, generation, coefficient, amplitude)
+    the child is the parent of buffer, mutated, written in the other buffer
+    """
+    buffer, child, parent, run, generation, coefficient, amplitude = task
+    children = worker_buffers[1 - buffer]
+    children[child] = worker_buffers[buffer][parent]
+    worker_mutation(children[child:child + 1], worker_network.genes_neurons(),
+                    coefficient, amplitude,
+                    Counter_Random(run, generation, member=child,
+                                   stream=MUTATION_STREAM))
+
+
+def worker_shard(task):
+    """
+    task is (buffer, start, end, proba_reproduction, run, generation,
+             coefficient, amplitude, evaluation_generation, nb_tests)
+    The children start to end are selected and mutated (as Herd.reproduce
+    would) into the other buffer, then evaluated for evaluation_generation
+    unless it is None
+    Returns the parents and the scores of the children
     """
-    def __init__(
-        self,
-        nb_sensors = 1,
-        nb_actors = 1,
-        nb_add_neurons = 0,
-        period = 1,
-        function = segments,
-        reset_after_process = True,
-        size = 5,
-        mutation_coefficent = 0.1,
-        mutation_amplitude = 0.001,
-        nb_tests = 1,
-        do_display = False,
-        **kwargs
-    ):
-        self.nb_sensors = nb_sensors
-        self.nb_actors = nb_actors
-        self.nb_add_neurons = nb_add_neurons
-        self.period = period
-        self.size = size
-        self.mutation_coefficent = mutation_coefficent
-        self.mutation_amplitude = mutation_amplitude
-        self.nb_tests = nb_tests
-        self.do_display = do_display
-        self.members = [
-            Network(nb_sensors, nb_actors, nb_add_neurons, period, function,
-                    reset_after_process, **kwargs)
-            for i in range(size)
+    (buffer, start, end, proba_reproduction, run, generation, coefficient,
+     amplitude, evaluation_generation, nb_tests) = task
+    children = worker_buffers[1 - buffer]
+    selection = Counter_Random(run, generation, stream=SELECTION_STREAM,
+                               step=start)
+    parents = selection.choice(len(proba_reproduction), end - start,
+                               p=proba_reproduction)
+    children[start:end] = worker_buffers[buffer][parents]
+    worker_mutation(children[start:end], worker_network.genes_neurons(),
+                    coefficient, amplitude,
+                    Counter_Random(run, generation, member=start,
+                                   stream=MUTATION_STREAM))
+    scores = None
+    if evaluation_generation != None:
+        scores = [
+            worker_score(children[index],
+                         [random_seed(run, evaluation_generation, index, i)
+                          for i in range(nb_tests)])
+            for index in range(start, end)
         ]
-        self.array_scores = []
-        self.date = date()
-        self.max_score = 0
-        self.max_score_index = 0
+    return(parents, scores)
+
+
+class Copy_Factory(object):
+    """
+    The default Problem factory : a copy of the Problem for every worker
+    (process or thread), so that no two workers share an episode
+    """
+    def __init__(self, Problem):
+        self.Problem = Problem
+
+    def __call__(self):
+        return(copy.deepcopy(self.Problem))
+
+
+class Process_Evaluator(Evaluator):
+    """
+    A pool of processes started once per evolve, each process builds its
+    Problem once from factory (a picklable function without argument, like
+    the Problem class, Copy_Factory of the Problem if None)
+    Tasks are a genome and the seeds of its tests, the scores come back
+    A persistent evaluator keeps its pool from one evolve to the other
+    (as long as the Problem and the topology stay the same), close stops it
+    The number of workers is chosen by the budget if nb_workers is None
+    """
+    def __init__(self, factory = None, nb_workers = None, persistent = False,
+                 budget = None):
+        self.factory = factory
+        self.fixed_workers = nb_workers
+        self.nb_workers = nb_workers
+        self.budget = budget
+        self.persistent = persistent
+        self.pool = None
+        self.signature = None
+        self.results = queue.Queue()
+
+    def start(self, Herd):
+        template = copy.deepcopy(Herd.members[0])
+        signature = (id(Herd.Problem), len(template.genome()))
+        if self.pool != None and signature == self.signature:
+            return
+        self.close()
+        factory = self.factory
+        if factory == None:
+            factory = Copy_Factory(Herd.Problem)
+        self.signature = signature
+        self.pool = self.new_pool(Herd, worker_start, (factory, template))
+
+    def new_pool(self, Herd, initializer, initargs):
+        """
+        A pool laid out by the budget
+        """
+        self.nb_workers, nb_threads = self.plan(Herd, self.fixed_workers)
+        return(mp.Pool(self.nb_workers, initializer=worker_initialize,
+                       initargs=(self.budget, mp.Value("i", 0), initializer,
+                                 initargs)))
+
+    def chunksize(self, Herd):
+        """
+        About 16 tests per task but at least 2 tasks per worker
+        """
+        return(max(1, min(16//Herd.nb_tests,
+                          Herd.size//(2*self.nb_workers))))
+
+    def evaluate(self, Herd):
+        tasks = [
+            (member.genome(),
+             [random_seed(Herd.run, Herd.generation, index, i)
+              for i in range(Herd.nb_tests)])
+            for index, member in enumerate(Herd.members)
+        ]
+        return(np.array(self.pool.map(worker_evaluate, tasks,
+                                      self.chunksize(Herd))))
+
+    def submit(self, Herd, member, seeds):
+        self.pool.apply_async(
+            worker_evaluate, ((member.genome(), seeds), ),
+            callback=lambda score: self.results.put((member, score)),
+            error_callback=lambda error: self.results.put((member, error)))
+
+    def result(self):
+        member, score = self.results.get()
+        if isinstance(score, BaseException):
+            raise(score)
+        return(member, score)
+
+    def stop(self, Herd):
+        if not self.persistent:
+            self.close()
+
+    def close(self):
+        if self.pool != None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+
+class Shared_Evaluator(Process_Evaluator):
+    """
+    A Process_Evaluator whose members live in shared memory : tasks only
+    carry member indexes and seeds, whatever the size of the Networks
+    The workers also make the children (same ones as Herd.reproduce) into
+    a second shared buffer, which the members then become views of
+    After evolve the members are copied out of the shared memory
+    """
+    def start(self, Herd):
+        template = copy.deepcopy(Herd.members[0])
+        shape = (Herd.size, len(template.genome()))
+        signature = (id(Herd.Problem), shape)
+        if self.pool != None and signature == self.signature:
+            return
+        self.close()
+        factory = self.factory
+        if factory == None:
+            factory = Copy_Factory(Herd.Problem)
+        self.signature = signature
+        self.blocks = [
+            shared_memory.SharedMemory(create=True, size=8*shape[0]*shape[1])
+            for i in range(2)
+        ]
+        self.buffers = [np.ndarray(shape, dtype=np.float64, buffer=block.buf)
+                        for block in self.blocks]
+        self.current = 0
+        self.members = None
+        self.pool = self.new_pool(
+            Herd, worker_start_shared,
+            (factory, template, [block.name for block in self.blocks], shape,
+             Herd.mutation))
+
+    def load(self, Herd):
+        """
+        Copies the members in shared memory if they are not there yet
+        """
+        if Herd.members is not self.members:
+            np.copyto(self.buffers[self.current],
+                      np.stack([member.genome() for member in Herd.members]))
+            self.members = Herd.members
 
-    def evolve(self, problem, nb_generations=1):
+    def views(self, Herd):
         """
-        The idea is to make the AI evolve by aproximating the gradient descent
-        Opens and closes the score output file multiple times so that it's
-        possible to see what's going on in during the training
+        The members become views of the current buffer
         """
-        if problem == None:
-            # The empty problem, just here for quick tests
-            self.Problem = Problem()
-        else:
-            self.Problem = problem
-        score_file = open(problem.__name__() + "_score" + self.date, "w")
-        score_file.write(
-            "score\n"
-            + "number of added neurons : {}\n".format(self.nb_add_neurons)
-            + "period : {}\n".format(self.period)
-            + "size : {}\n".format(self.size)
-            + "mutation coefficent : {}\n".format(self.mutation_coefficent)
-            + "mutation_amplitude : {}\n".format(self.mutation_amplitude)
-            + "number of tests : {}\n".format(self.nb_tests)
-            + "number of generations to proceed : {}\n".format(nb_generations)
-        )
-        score_file.close()
-        self.Problem_pool = extend([self.Problem], self.size*self.nb_tests)
-        for pb in self.Problem_pool:
-            pb.do_display = False
-        if self.do_display:
-            self.Problem_pool[0].do_display = True
-        for generation in range(nb_generations):
-            # Evaluation of performances
-            proba_reproduction = self.performances()
-            # Reproduction (with mutation) of Networks
-            self.reproduce(proba_reproduction)
-            # Saves the scores
-            self.max_score = max(self.score)
-            self.max_score_index = self.score.index(self.max_score)
-            self.array_scores.append(self.max_score)
-            # Saves one Network and the score evolution
-            self.members[self.max_score_index].save(
-                problem.__name__() + "_Network" + self.date, "w", False)
-            score_file = open(problem.__name__() + "_score" + self.date, "a")
-            score_file.write(
-                "generation n° {} : {} \n".format(
-                    generation, str(self.max_score)))
-            score_file.close()
-        score_file = open(problem.__name__() + "_score" + self.date, "a")
-        score_file.write("End\n")
-        score_file.close()
-        return(self.array_scores)
-
-    def performances(self):
+        population = Population(Herd.members[:1])
+        population.select(np.zeros(Herd.size, dtype=int))
+        population.genome = self.buffers[self.current]
+        population.make_views()
+        Herd.members = population.networks()
+        self.members = Herd.members
+
+    def evaluate(self, Herd):
+        self.load(Herd)
+        tasks = [
+            (self.current, index,
+             [random_seed(Herd.run, Herd.generation, index, i)
+              for i in range(Herd.nb_tests)])
+            for index in range(Herd.size)
+        ]
+        return(np.array(self.pool.map(worker_evaluate_shared, tasks,
+                                      self.chunksize(Herd))))
+
+    def reproduce(self, Herd, parents):
+        self.load(Herd)
+        tasks = [
+            (self.current, child, parent, Herd.run, Herd.generation,
+             Herd.mutation_coefficent, Herd.mutation_amplitude)
+            for child, parent in enumerate(parents)
+        ]
+        self.pool.map(worker_reproduce, tasks,
+                      max(1, Herd.size//(4*self.nb_workers)))
+        self.current = 1 - self.current
+        self.views(Herd)
+
+    def stop(self, Herd):
+        # Copies the members out of the shared memory
+        Herd.members = [copy.deepcopy(member) for member in Herd.members]
+        self.members = None
+        if not self.persistent:
+            self.close()
+
+    def close(self):
+        Process_Evaluator.close(self)
+        if self.signature != None:
+            self.buffers = []
+            for block in self.blocks:
+                block.close()
+                block.unlink()
+            self.blocks = []
+            self.signature = None
+
+
+class Shard_Evaluator(Shared_Evaluator):
+    """
+    A Shared_Evaluator where each worker takes a shard of the Herd for a
+    whole generation : it selects the parents of its children (from the
+    scores broadcast by the parent process), mutates them and evaluates
+    them, only the parents and the scores come back
+    reproduce only remembers the scores, the work is done by the evaluate
+    of the next generation (or by stop after the last one)
+    The children are the same as with Herd.reproduce
+    nb_shards : nb_workers by default
+    """
+    def __init__(self, factory = None, nb_workers = None, persistent = False,
+                 nb_shards = None, budget = None):
+        Shared_Evaluator.__init__(self, factory, nb_workers, persistent,
+                                  budget)
+        self.nb_shards = nb_shards
+        self.pending = None
+        self.parents = None
+
+    def evaluate(self, Herd):
+        if self.pending is None:
+            return(Shared_Evaluator.evaluate(self, Herd))
+        return(self.advance(Herd, Herd.generation))
+
+    def reproduce(self, Herd, parents):
+        self.load(Herd)
+        self.pending = (Herd.modif_score(Herd.score), Herd.generation,
+                        Herd.mutation_coefficent, Herd.mutation_amplitude)
+
+    def advance(self, Herd, evaluation_generation):
         """
-        Evaluates performances then normalises them for probability operations
-        Can be parallelized
+        Makes the pending generation in the shards, and evaluates it unless
+        evaluation_generation is None
         """
-        self.members_pool = extend(self.members, self.nb_tests)
-        # parallelize the evaluation of the networks
-        pool = mp.Pool()
-        member_s_points = pool.map(
-            evaluate,
-            [(P, M) for P,M in zip(self.Problem_pool, self.members_pool)]
-        )
-        pool.close()
-        # Put this code if you want to observe evolution, especially in the
-        # Gradient Descent Problem because parallelization makes it not work
-        #self.Problem.experience(self.members_pool[0])
-        #self.members_pool[0].reset()
-        self.score = mean(member_s_points, self.nb_tests)
-        score_modif = self.modif_score(self.score)
-        return(score_modif)
-
-    def reproduce(self, proba_reproduction):
+        proba_reproduction, generation, coefficient, amplitude = self.pending
+        nb_shards = self.nb_shards
+        if nb_shards == None:
+            nb_shards = self.nb_workers
+        limits = np.linspace(0, Herd.size, nb_shards + 1).astype(int)
+        tasks = [
+            (self.current, limits[i], limits[i + 1], proba_reproduction,
+             Herd.run, generation, coefficient, amplitude,
+             evaluation_generation, Herd.nb_tests)
+            for i in range(nb_shards) if limits[i] < limits[i + 1]
+        ]
+        results = self.pool.map(worker_shard, tasks, 1)
+        self.pending = None
+        self.current = 1 - self.current
+        self.views(Herd)
+        self.parents = np.concatenate([parents for parents, scores in results])
+        if evaluation_generation != None:
+            return(np.concatenate([scores for parents, scores in results]))
+
+    def stop(self, Herd):
+        try:
+            if self.pending is not None:
+                self.advance(Herd, None)
+        finally:
+            self.pending = None
+            Shared_Evaluator.stop(self, Herd)
+
+
+class Dynamic_Evaluator(Shared_Evaluator):
+    """
+    A Shared_Evaluator for tests of very different lengths : every test of
+    every member is a task of its own, handed to the workers as soon as they
+    are free, the members that took the longest at the previous generation
+    first (children inherit the cost of their parent)
+    utilization keeps for each generation the share of the time the
+    workers were busy
+    """
+    def __init__(self, factory = None, nb_workers = None, persistent = False,
+                 budget = None):
+        Shared_Evaluator.__init__(self, factory, nb_workers, persistent,
+                                  budget)
+        self.costs = None
+        self.utilization = []
+
+    def start(self, Herd):
+        Shared_Evaluator.start(self, Herd)
+        if self.costs is None or len(self.costs) != Herd.size:
+            self.costs = np.zeros(Herd.size)
+
+    def evaluate(self, Herd):
+        self.load(Herd)
+        order = np.argsort(-self.costs, kind="stable")
+        tasks = [
+            (self.current, index, i,
+             random_seed(Herd.run, Herd.generation, index, i))
+            for index in order for i in range(Herd.nb_tests)
+        ]
+        scores = np.zeros((Herd.size, Herd.nb_tests))
+        self.costs = np.zeros(Herd.size)
+        start = time.perf_counter()
+        for index, i, score, duration in self.pool.imap_unordered(
+            worker_unit, tasks
+        ):
+            scores[index, i] = score
+            self.costs[index] += duration
+        elapsed = time.perf_counter() - start
+        self.utilization.append(self.costs.sum()/(elapsed*self.nb_workers))
+        # Summed in the order of the tests, like the other evaluators
+        score = np.zeros(Herd.size)
+        for i in range(Herd.nb_tests):
+            score += scores[:, i]
+        return(score/Herd.nb_tests)
+
+    def reproduce(self, Herd, parents):
+        Shared_Evaluator.reproduce(self, Herd, parents)
+        self.costs = self.costs[parents]
+
+    def report(self):
+        if self.utilization == []:
+            return(Evaluator.report(self))
+        return(Evaluator.report(self) + "\nutilization : {:.3f}".format(
+            self.utilization[-1]))
+
+
+class Thread_Evaluator(Evaluator):
+    """
+    A pool of threads, each with its Problem (built by factory like in
+    Process_Evaluator) drawing from a RandomState of its own (its random,
+    see Problem), np.random itself is left to the main thread
+    A RandomState seeded with s draws what np.random does after seed(s)
+    Nothing is copied nor pickled, it pays when the time goes in np.matmul
+    (big networks) as it releases the GIL
+    """
+    def __init__(self, factory = None, nb_workers = None, persistent = False,
+                 budget = None):
+        self.factory = factory
+        self.fixed_workers = nb_workers
+        self.nb_workers = nb_workers
+        self.budget = budget
+        self.persistent = persistent
+        self.pool = None
+        self.signature = None
+        self.local = threading.local()
+        self.results = queue.Queue()
+
+    def start(self, Herd):
+        if self.pool == None or self.signature != id(Herd.Problem):
+            self.close()
+            self.nb_workers, nb_threads = self.plan(Herd, self.fixed_workers)
+            factory = self.factory
+            if factory == None:
+                factory = Copy_Factory(Herd.Problem)
+            self.signature = id(Herd.Problem)
+            self.pool = ThreadPoolExecutor(self.nb_workers,
+                                           initializer=self.thread_start,
+                                           initargs=(factory, ))
+        self.budget.apply()
+
+    def thread_start(self, factory):
+        self.local.problem = factory()
+        self.local.problem.random = np.random.RandomState()
+
+    def score(self, member, seeds):
+        return(score_tests(self.local.problem, member, seeds))
+
+    def evaluate(self, Herd):
+        seeds = [[random_seed(Herd.run, Herd.generation, index, i)
+                  for i in range(Herd.nb_tests)]
+                 for index in range(Herd.size)]
+        return(np.array(list(self.pool.map(self.score, Herd.members,
+                                           seeds))))
+
+    def submit(self, Herd, member, seeds):
+        future = self.pool.submit(self.score, member, seeds)
+        future.add_done_callback(
+            lambda future: self.results.put((member, future.exception()
+                                             or future.result())))
+
+    def result(self):
+        member, score = self.results.get()
+        if isinstance(score, BaseException):
+            raise(score)
+        return(member, score)
+
+    def stop(self, Herd):
+        if not self.persistent:
+            self.close()
+        self.budget.release()
+
+    def close(self):
+        if self.pool != None:
+            self.pool.shutdown()
+            self.pool = None
+        if self.budget != None:
+            self.budget.release()
+
+
+class Auto_Evaluator(Evaluator):
+    """
+    Chooses at start between Serial_Evaluator, Thread_Evaluator and
+    Process_Evaluator from the time a member takes :
+        not enough work per generation to pay for workers : serial
+        the steps are mostly np.matmul (big networks) : threads
+        otherwise : processes
+    The choice is written in the score file
+    """
+    min_generation_time = 0.05
+    min_matmul_part = 0.5
+    min_thread_neurons = 256
+
+    def __init__(self, factory = None, nb_workers = None, budget = None):
+        self.factory = factory
+        self.fixed_workers = nb_workers
+        self.nb_workers = nb_workers
+        self.budget = budget
+        self.evaluator = None
+        self.costs = None
+
+    def measure(self, Herd, nb_steps = 32):
         """
-        The copy of the successful networks with mutation
-        parallelized
+        Returns the time of a test, of a step and of the matmul of a step
+        of the first member
         """
-        pool = mp.Pool()
-        new_members = (
-            pool.map(
-                prob_reproduction,
-                [(
-                    self.members,
-                    proba_reproduction,
-                    self.mutation_coefficent,
-                    self.mutation_amplitude
-                )]*self.size
-            )
-        )
-        self.members = new_members
-        pool.close()
+        member = copy.deepcopy(Herd.members[0])
+        problem = copy.deepcopy(Herd.Problem)
+        state = np.random.get_state()
+        np.random.seed(random_seed(Herd.run, Herd.generation, 0, 0))
+        start = time.perf_counter()
+        problem.reset()
+        problem.experience(member)
+        test_time = time.perf_counter() - start
+        np.random.set_state(state)
+        member.reset()
+        start = time.perf_counter()
+        for i in range(nb_steps):
+            member.iteration()
+        step_time = (time.perf_counter() - start)/nb_steps
+        start = time.perf_counter()
+        for i in range(nb_steps):
+            member.weights @ member.values
+        matmul_time = (time.perf_counter() - start)/nb_steps
+        member.reset()
+        return(test_time, step_time, matmul_time)
+
+    def choose(self, Herd):
+        test_time, step_time, matmul_time = self.costs
+        nb_workers = self.fixed_workers
+        if nb_workers == None:
+            nb_workers = len(available_cores())
+        if (nb_workers == 1
+            or test_time*Herd.nb_tests*Herd.size < self.min_generation_time):
+            return(Serial_Evaluator())
+        if (matmul_time > self.min_matmul_part*step_time
+            and Herd.members[0].nb_neurons >= self.min_thread_neurons):
+            return(Thread_Evaluator(self.factory, self.fixed_workers,
+                                    budget=self.budget))
+        return(Process_Evaluator(self.factory, self.fixed_workers,
+                                 budget=self.budget))
+
+    def start(self, Herd):
+        self.costs = self.measure(Herd)
+        self.evaluator = self.choose(Herd)
+        self.evaluator.start(Herd)
+        # The workers of the chosen evaluator (see Herd.steady_state)
+        self.nb_workers = self.evaluator.nb_workers
+
+    def evaluate(self, Herd):
+        return(self.evaluator.evaluate(Herd))
+
+    def submit(self, Herd, member, seeds):
+        self.evaluator.submit(Herd, member, seeds)
+
+    def result(self):
+        return(self.evaluator.result())
+
+    def reproduce(self, Herd, parents):
+        self.evaluator.reproduce(Herd, parents)
 
+    def stop(self, Herd):
+        # Nothing was started if start failed before the choice
+        if self.evaluator != None:
+            self.evaluator.stop(Herd)
+
+    def report(self):
+        if self.evaluator == None:
+            return("")
+        report = ("evaluator : {} (test {:.2e}s, step {:.2e}s, matmul "
+                  "{:.2e}s)").format(type(self.evaluator).__name__,
+                                     *self.costs)
+        if self.evaluator.report() != "":
+            report += "\n" + self.evaluator.report()
+        return(report)
+
+
+class CPU_Herd(Herd):
+    """
+    Herd of networks that evolve by reproducing
+    The members are evaluated by a pool of processes (Process_Evaluator by
+    default), Thread_Evaluator uses threads, Auto_Evaluator picks one
+    """
+    def __init__(self, *args, evaluator = None, **kwargs):
+        if evaluator is None:
+            evaluator = Process_Evaluator()
+        Herd.__init__(self, *args, evaluator=evaluator, **kwargs)
@@ -20,21 +20,22 @@ def rotation(Vector2D, angle): # angle in radians
 class Circuit():
     """
     A circuit for cars
+    random is the generator of its road (see Problem)
     """
-    def __init__(self, size=8):
+    def __init__(self, size=8, random=np.random):
         self.size = size
         self.pos0 = np.array([0.5, 0.5])
         self.dir0 = np.array([1.0, 0.0])
         self.road = -np.ones((self.size, self.size))
         self.path = []
-        self.road_generation()
+        self.road_generation(random)
         self.path_len = self.road[self.pos_final]
 
-    def road_generation(self):
-        self.make_circuit()
+    def road_generation(self, random=np.random):
+        self.make_circuit(random)
         self.make_points()
 
-    def make_circuit(self):
+    def make_circuit(self, random=np.random):
         """
         Makes an empty circuit
         """
@@ -44,7 +45,7 @@ class Circuit():
         x = 0
         y = 0
         while not self.end_construction_condition(i, x, y):
-            direction = np.random.choice(possibilites)
+            direction = random.choice(possibilites)
             possibilites.remove(direction)
             if (
                 direction == 0
@@ -185,15 +186,16 @@ class Car(Problem):
     ):
         # Circuit code
         if circuit == None:
-            self.Circuit = Circuit(size)
+            self.Circuit = Circuit(size, self.random)
             self.circuit_pre_defined = False
         else:
             self.Circuit = circuit
             self.circuit_pre_defined = True
         self.size = self.Circuit.size
         self.path_len = self.Circuit.path_len
-        self.pos = self.Circuit.pos0
-        self.dir = self.Circuit.dir0
+        # Copies, a crash moves pos in place and the circuit can be reused
+        self.pos = np.array(self.Circuit.pos0)
+        self.dir = np.array(self.Circuit.dir0)
         # Physics
         self.speed = np.array([0.0, 0.0])
         self.acceleration = np.array([0.0, 0.0])
@@ -291,6 +293,9 @@ class Car(Problem):
         if score_here > self.score:
             self.score = score_here
 
+    def step(self, output):
+        self.action(*output)
+
     def action(self, pedale, volant):
         self.acceleration += self.engine_quality*pedale*self.dir
         self.dir = rotation(self.dir, self.turning_circle*volant)
@@ -376,6 +381,199 @@ class Car(Problem):
         )
 
 
+def rotations(vectors, angles):
+    """
+    rotation of every row of vectors by its angle
+    """
+    c, s = np.cos(angles), np.sin(angles)
+    return(np.stack((c*vectors[:, 0] - s*vectors[:, 1],
+                     s*vectors[:, 0] + c*vectors[:, 1]), axis=1))
+
+
+class Batch_Car(Batch_Problem):
+    """
+    Many cars driving at once : every quantity of Car (pos, dir, speed,
+    acceleration, score...) is an array with one row per car and each step
+    moves every running car in a few numpy operations
+    The dynamics are the ones of Car (a car that hits a wall stops there)
+    circuits :
+        "episode" : a new Circuit per car (like Car)
+        "shared" : one new Circuit for all the cars of a batch
+        a Circuit : this one for every car
+    batch_experience drives nb_tests cars per member of the Population at
+    once and gives each member its mean score
+    Rays are cast block steps at a time for every car
+    """
+    def __init__(
+        self,
+        size = 8,
+        Δd = 0.01,
+        Δt = 0.01,
+        dmax = 4,
+        turning_circle = 20,
+        engine_quality = 20,
+        circuits = "episode",
+        nb_tests = 1,
+        block = 64,
+    ):
+        self.size = size
+        self.Δd = Δd
+        self.Δt = Δt
+        self.dmax = dmax
+        self.turning_circle = turning_circle
+        self.engine_quality = engine_quality
+        self.circuits = circuits
+        self.nb_tests = nb_tests
+        self.block = block
+        self.nb_sensors = 12
+        self.nb_actors = 2
+        self.done = np.zeros((0), dtype=bool)
+        self.score = np.zeros((0))
+
+    def batch_experience(self, Population):
+        if self.nb_tests == 1:
+            return(Batch_Problem.batch_experience(self, Population))
+        tests = copy.copy(Population)
+        tests.select(np.tile(np.arange(Population.size), self.nb_tests))
+        score = Batch_Problem.batch_experience(self, tests)
+        return(score.reshape((self.nb_tests, Population.size)).mean(axis=0))
+
+    def start(self, nb_episodes):
+        if self.circuits == "episode":
+            circuits = [Circuit(self.size) for i in range(nb_episodes)]
+            self.circuit = np.arange(nb_episodes)
+        else:
+            if self.circuits == "shared":
+                circuits = [Circuit(self.size)]
+            else:
+                circuits = [self.circuits]
+            self.circuit = np.zeros((nb_episodes), dtype=int)
+        self.roads = np.stack([circuit.road for circuit in circuits])
+        lengths = [len(circuit.path) for circuit in circuits]
+        self.paths = -np.ones((len(circuits), max(lengths), 2))
+        for i, circuit in enumerate(circuits):
+            self.paths[i, :lengths[i]] = circuit.path
+        self.path_lengths = np.array(lengths)[self.circuit]
+        self.path_len = np.array([circuit.path_len
+                                  for circuit in circuits])[self.circuit]
+        self.pos = np.array([circuit.pos0 for circuit in circuits],
+                            dtype=float)[self.circuit]
+        self.dir = np.array([circuit.dir0 for circuit in circuits],
+                            dtype=float)[self.circuit]
+        self.speed = np.zeros((nb_episodes, 2))
+        self.acceleration = np.zeros((nb_episodes, 2))
+        self.score = np.zeros((nb_episodes))
+        self.done = self.state_pos(self.pos, self.circuit) == self.path_len
+
+    def state_pos(self, pos, circuit):
+        """
+        The state of positions (wall or road) on the circuits of index
+        circuit (of the shape of pos without its last dimension)
+        """
+        x, y = pos[..., 0], pos[..., 1]
+        inside = (~(x < 0) & ~(self.size < x + 1)
+                  & ~(y < 0) & ~(self.size < y + 1))
+        x = np.where(inside, np.floor(np.where(inside, x, 0)), 0).astype(int)
+        y = np.where(inside, np.floor(np.where(inside, y, 0)), 0).astype(int)
+        return(np.where(inside, self.roads[circuit, x, y], -1))
+
+    def rays(self, pos, direction, distance, circuit):
+        """
+        Car.ray for every row, returns the distances
+        """
+        result = np.array(distance, dtype=float)
+        norm = np.linalg.norm(direction, axis=1)
+        looking = np.nonzero(distance > 0)[0]
+        start = 1
+        while looking.size > 0:
+            steps = np.arange(start, start + self.block)
+            valid = (steps[None, :] - 1)*self.Δd < distance[looking, None]
+            points = (pos[looking, None, :]
+                      + direction[looking, None, :]*steps[None, :, None]
+                      *self.Δd/norm[looking, None, None])
+            wall = valid & (self.state_pos(points, circuit[looking, None])
+                            == -1)
+            hit = np.any(wall, axis=1)
+            first = np.argmax(wall, axis=1)
+            result[looking[hit]] = (steps[first[hit]] - 1)*self.Δd
+            looking = looking[~hit & valid[:, -1]]
+            start += self.block
+        return(result)
+
+    def captors(self, running):
+        pos = np.tile(self.pos[running], (3, 1))
+        direction = np.concatenate((
+            rotations(self.dir[running], np.pi/3),
+            rotations(self.dir[running], -np.pi/3),
+            self.dir[running]
+        ))
+        circuit = np.tile(self.circuit[running], 3)
+        distance = self.rays(pos, direction,
+                             np.full((len(pos)), float(self.dmax)), circuit)
+        return(distance.reshape((3, -1)).T)
+
+    def next_pos(self, running):
+        score = self.score[running]
+        index = np.minimum(score.astype(int) + 1, self.paths.shape[1] - 1)
+        next_pos = self.paths[self.circuit[running], index]
+        return(np.where((score + 1 < self.path_lengths[running])[:, None],
+                        next_pos, -1))
+
+    def state(self):
+        running = np.nonzero(~self.done)[0]
+        state = np.zeros((len(self.done), self.nb_sensors))
+        state[running] = np.concatenate((
+            self.pos[running],
+            self.dir[running],
+            self.acceleration[running],
+            self.captors(running),
+            self.next_pos(running),
+            self.score[running, None]
+        ), axis=1)
+        return(state)
+
+    def action(self, output):
+        running = np.nonzero(~self.done)[0]
+        pedale, volant = output[running, 0], output[running, 1]
+        pos = self.pos[running]
+        acceleration = (self.acceleration[running]
+                        + self.engine_quality*pedale[:, None]
+                        *self.dir[running])
+        self.dir[running] = rotations(self.dir[running],
+                                      self.turning_circle*volant)
+        speed = self.speed[running]
+        pos_projection = (
+            (1/2)*acceleration*self.Δt**2
+            + speed*self.Δt
+            + pos
+        )
+        direction_projection = pos - pos_projection
+        distance_projection = np.linalg.norm(direction_projection, axis=1)
+        drived_distance = self.rays(pos, direction_projection,
+                                    distance_projection, self.circuit[running])
+        # Car ends at a wall : its previous_pos is its pos
+        hit = drived_distance != distance_projection
+        new_pos = pos_projection
+        new_pos[hit] = (
+            pos[hit]
+            + direction_projection[hit]
+            /distance_projection[hit, None]*drived_distance[hit, None]
+        )
+        speed[hit] = 0
+        speed[~hit] += acceleration[~hit]*self.Δt
+        self.acceleration[running] = acceleration
+        self.speed[running] = speed
+        self.pos[running] = new_pos
+        state_pos = self.state_pos(new_pos, self.circuit[running])
+        self.score[running] = np.maximum(self.score[running],
+                                         state_pos/self.path_len[running])
+        self.done[running] = (hit | np.all(new_pos == pos, axis=1)
+                              | (state_pos == self.path_len[running]))
+
+    def __name__(self):
+        return("Car")
+
+
 def main():
     P = Car(False, 4)
     TB = TestBench(
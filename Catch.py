@@ -27,7 +27,10 @@ class Catch():
     player = 0.1
     object = 0.2
     spot = 0.3
+    random is the generator it draws from (see Problem)
     """
+    random = np.random
+
     def __init__(self, do_run_display = False, do_end_display = False,
                  size = 4, max_score = 100):
         self.do_run_display = do_run_display
@@ -102,7 +105,7 @@ class Catch():
             # If there is no object
             if not self.spotted:
                 # Spotting the object
-                self.spot = np.random.randint(2*self.size + 1)
+                self.spot = self.random.randint(2*self.size + 1)
                 self.spotted = True
                 self.grid[0, self.spot] = 0.3
                 self.wait = self.size
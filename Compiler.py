@@ -0,0 +1,1316 @@
+#!/usr/bin/env python3
+
+"""
+Program written by Mattias Kockum
+On the 18/10/2026
+The aim of this program is to turn a Network into C code and to compile it
+    either into a standalone executable reading and writing streams
+    or into a shared library that Python uses through ctypes
+"""
+
+import numpy as np
+import ctypes
+import os
+import subprocess
+import hashlib
+import time
+import copy
+import shutil
+import tempfile
+
+from GPU_code_maker import defines
+
+
+# C code pieces
+
+def c_array(array, number = float):
+    """
+    A C initializer of a numpy array of any dimension
+    number is float for C floating types, int for integer ones
+    """
+    if len(np.shape(array)) == 1:
+        return("{" + ", ".join([repr(number(i)) for i in array]) + "}")
+    return("{" + ", ".join([c_array(i, number) for i in array]) + "}")
+
+def c_defines(N):
+    return(defines(N.nb_sensors, N.nb_actors, N.nb_add_neurons, N.period,
+                   N.function.__name__))
+
+def c_activations(c_type = "float"):
+    """
+    The activation functions of AI.py in C
+    """
+    return(
+        """static {0} sigmoid({0} x)\n"""
+        + """{{\n"""
+        + """    return -1 + (2/(1+exp(-x)));\n"""
+        + """}}\n"""
+        + """\n"""
+        + """static {0} ramp({0} x)\n"""
+        + """{{\n"""
+        + """    return (x>0) ? x : 0;\n"""
+        + """}}\n"""
+        + """\n"""
+        + """static {0} segments({0} x)\n"""
+        + """{{\n"""
+        + """    if (x>1)\n"""
+        + """    {{\n"""
+        + """        return 1;\n"""
+        + """    }}\n"""
+        + """    if (x<-1)\n"""
+        + """    {{\n"""
+        + """        return -1;\n"""
+        + """    }}\n"""
+        + """    return x;\n"""
+        + """}}\n"""
+        + """\n"""
+        + """static {0} threshold({0} x)\n"""
+        + """{{\n"""
+        + """    return (x>0) - (x<0);\n"""
+        + """}}\n"""
+        + """\n"""
+    ).format(c_type)
+
+def executable_code(N, io = "text", specialize = True, quantization = None):
+    """
+    The C code of a standalone executable reading the sensors from an input
+    stream and writing the actors to an output stream, PERIOD iterations per
+    step and never reset
+    io = "text" : one line of sensors in, one line of actors out per step
+    io = "binary" : see binary_main
+    specialize = False keeps the generic iteration over the whole matrix
+    (see specialized_iteration)
+    quantization : a Quantization of N, made with nb_iterations = PERIOD and
+    reset = False, to compute in integers (specialize is then not used)
+    """
+    if io == "text":
+        main = text_main(N)
+    elif io == "binary":
+        main = binary_main(N)
+    else:
+        raise(ValueError("Unknown io mode {}".format(io)))
+    step = (
+        """void step(Network *N, const double *inputs, double *outputs)\n"""
+        + """{\n"""
+        + """    int i;\n"""
+        + """    for (i=0; i<NB_SENSORS; i++)\n"""
+        + """    {\n"""
+        + """        N->values[i] += inputs[i];\n"""
+        + """    }\n"""
+        + """    for (i=0; i<PERIOD; i++)\n"""
+        + """    {\n"""
+        + """        iteration(N);\n"""
+        + """    }\n"""
+        + """    for (i=0; i<NB_ACTORS; i++)\n"""
+        + """    {\n"""
+        + """        outputs[i] = N->values[NB_TOTAL_NEURONS - NB_ACTORS + i];\n"""
+        + """    }\n"""
+        + """}\n"""
+        + """\n"""
+    )
+    if quantization is not None:
+        network = (
+            """#define NETWORK {{{}}}\n""".format(
+                c_array(quantization.initial_values, int))
+            + """\n"""
+            + """typedef struct Network\n"""
+            + """{\n"""
+            + """    int16_t values[NB_TOTAL_NEURONS];\n"""
+            + """}\n"""
+            + """Network;\n"""
+            + """\n"""
+            + quantization.iteration("void iteration(Network *N)",
+                                     "N->values")
+        )
+        step = quantization.step(
+            "void step(Network *N, const double *inputs, double *outputs)",
+            "N->values", "iteration(N)", "PERIOD", False)
+    elif specialize:
+        network = (
+            """#define NETWORK {{{}}}\n""".format(c_array(N.values))
+            + """\n"""
+            + """typedef struct Network\n"""
+            + """{\n"""
+            + """    double values[NB_TOTAL_NEURONS];\n"""
+            + """}\n"""
+            + """Network;\n"""
+            + """\n"""
+            + c_activations("double")
+            + specialized_iteration(N, "void iteration(Network *N)",
+                                    "N->values")
+        )
+    else:
+        network = (
+            """#define VALUES {}\n""".format(c_array(N.values))
+            + """#define BIAS {}\n""".format(c_array(N.bias))
+            + """#define WEIGHTS {}\n""".format(
+                c_array(np.asarray(N.weights)))
+            + """#define NETWORK {VALUES, BIAS, WEIGHTS}\n"""
+            + """\n"""
+            + """typedef struct Network\n"""
+            + """{\n"""
+            + """    double values[NB_TOTAL_NEURONS];\n"""
+            + """    double bias[NB_TOTAL_NEURONS];\n"""
+            + """    double weights[NB_TOTAL_NEURONS][NB_TOTAL_NEURONS];\n"""
+            + """}\n"""
+            + """Network;\n"""
+            + """\n"""
+            + c_activations("double")
+            + """void iteration(Network *N)\n"""
+            + """{\n"""
+            + """    double values2[NB_TOTAL_NEURONS];\n"""
+            + """    int i;\n"""
+            + """    int j;\n"""
+            + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+            + """    {\n"""
+            + """        values2[i] = 0;\n"""
+            + """    }\n"""
+            + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+            + """    {\n"""
+            + """        for (j=0; j<NB_TOTAL_NEURONS; j++)\n"""
+            + """        {\n"""
+            + """            values2[j]+=N->weights[j][i]*(N->bias[i]+"""
+                + """N->values[i]);\n"""
+            + """        }\n"""
+            + """    }\n"""
+            + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+            + """    {\n"""
+            + """        N->values[i] = FUNCTION(values2[i]);\n"""
+            + """    }\n"""
+            + """}\n"""
+            + """\n"""
+        )
+    return(
+        """#include <stdio.h>\n"""
+        + """#include <stdlib.h>\n"""
+        + """#include <stdint.h>\n"""
+        + """#include <math.h>\n"""
+        + """\n"""
+        + c_defines(N)
+        + network
+        + step
+        + main
+    )
+
+def weight_blocks(N):
+    """
+    The blocks of the weights that can hold something :
+    (first row, first column, array)
+    the living blocks of a sliced Network, else the whole matrix
+    """
+    if hasattr(N.weights, "living"):
+        return([
+            (N.weights.slices_sum[i], N.weights.slices_sum[j], array)
+            for (i, j), array in zip(N.weights.living, N.weights.arrays)
+        ])
+    return([(0, 0, np.asarray(N.weights))])
+
+def specialized_iteration(N, signature, values, density = 0.25,
+                          unroll_limit = 256):
+    """
+    An iteration written for this very Network :
+    the dead blocks and the zero weights are skipped (see block_code)
+    signature is the C declaration of the function, values the C expression
+    of the array of values it updates
+    """
+    tables = ""
+    body = ""
+    for k, (row, column, array) in enumerate(weight_blocks(N)):
+        block_tables, block_body = block_code(k, row, column, array, "double",
+                                              float, density, unroll_limit)
+        tables += block_tables
+        body += block_body
+    return(
+        """static const double bias[NB_TOTAL_NEURONS] = {};\n""".format(
+            c_array(N.bias))
+        + tables
+        + """\n"""
+        + """{}\n""".format(signature)
+        + """{\n"""
+        + """    double x[NB_TOTAL_NEURONS];\n"""
+        + """    double s[NB_TOTAL_NEURONS] = {0};\n"""
+        + """    double sum;\n"""
+        + """    int i;\n"""
+        + """    int j;\n"""
+        + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+        + """    {\n"""
+        + """        x[i] = {0}[i] + bias[i];\n""".format(values)
+        + """    }\n"""
+        + body
+        + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+        + """    {\n"""
+        + """        {0}[i] = FUNCTION(s[i]);\n""".format(values)
+        + """    }\n"""
+        + """}\n"""
+        + """\n"""
+    )
+
+def block_code(k, row, column, array, c_type = "double", number = float,
+               density = 0.25, unroll_limit = 256):
+    """
+    The C code adding the products of the k-th block of weights (of C type
+    c_type) by the array x into the array s, as (tables, body) :
+        a row-major loop over a const table if it is dense enough
+        else unrolled products with the weights as constants if it is small
+        else a loop over const compressed sparse rows
+    Nothing if the block is empty
+    """
+    nb_rows, nb_columns = array.shape
+    nb_nonzero = np.count_nonzero(array)
+    tables = ""
+    body = ""
+    if nb_nonzero == 0:
+        return(tables, body)
+    if nb_nonzero > density*array.size:
+        tables += "static const {} block_{}[{}][{}] = {};\n".format(
+            c_type, k, nb_rows, nb_columns, c_array(array, number))
+        body += (
+            """    for (i=0; i<{}; i++)\n""".format(nb_rows)
+            + """    {\n"""
+            + """        sum = 0;\n"""
+            + """        for (j=0; j<{}; j++)\n""".format(nb_columns)
+            + """        {\n"""
+            + """            sum += block_{}[i][j]*x[{} + j];\n""".format(
+                k, column)
+            + """        }\n"""
+            + """        s[{} + i] += sum;\n""".format(row)
+            + """    }\n"""
+        )
+    elif nb_nonzero <= unroll_limit:
+        for i in range(nb_rows):
+            columns = np.nonzero(array[i])[0]
+            if len(columns) > 0:
+                body += "    s[{}] += {};\n".format(row + i, " + ".join([
+                    "{!r}*x[{}]".format(number(array[i, j]), column + j)
+                    for j in columns]))
+    else:
+        rows_start = np.concatenate(
+            ([0], np.cumsum(np.count_nonzero(array, axis=1))))
+        columns = np.nonzero(array)[1]
+        tables += (
+            "static const int rows_{}[{}] = {{{}}};\n".format(
+                k, nb_rows + 1, ", ".join([str(i) for i in rows_start]))
+            + "static const int columns_{}[{}] = {{{}}};\n".format(
+                k, nb_nonzero, ", ".join([str(i) for i in columns]))
+            + "static const {} weights_{}[{}] = {};\n".format(
+                c_type, k, nb_nonzero, c_array(array[array != 0], number))
+        )
+        body += (
+            """    for (i=0; i<{}; i++)\n""".format(nb_rows)
+            + """    {\n"""
+            + """        sum = 0;\n"""
+            + """        for (j=rows_{0}[i]; j<rows_{0}[i + 1]; j++)\n""".format(
+                k)
+            + """        {\n"""
+            + """            sum += weights_{0}[j]*x[{1} + columns_{0}[j]];\n""".format(
+                k, column)
+            + """        }\n"""
+            + """        s[{} + i] += sum;\n""".format(row)
+            + """    }\n"""
+        )
+    return(tables, body)
+
+def text_main(N):
+    string_format_input = (N.nb_sensors*"%lf ")[:-1]
+    string_input = ", ".join(
+        ["&inputs[{}]".format(i) for i in range(N.nb_sensors)])
+    string_format_output = (N.nb_actors*"%lf ")[:-1]
+    string_output = ", ".join(
+        ["outputs[{}]".format(i) for i in range(N.nb_actors)])
+    return(
+        """int main(int argc, char * argv[])\n"""
+        + """{\n"""
+        + """    if (argc != 3)\n"""
+        + """    {\n"""
+        + """        printf("Use format : input_file output_file\\n");\n"""
+        + """        return 1;\n"""
+        + """    }\n"""
+        + """    Network N = NETWORK;\n"""
+        + """    double inputs[NB_SENSORS];\n"""
+        + """    double outputs[NB_ACTORS];\n"""
+        + """    FILE *input_file;\n"""
+        + """    input_file = fopen(argv[1], "r");\n"""
+        + """    if (input_file == NULL)\n"""
+        + """    {\n"""
+        + """        perror("input_file opening");\n"""
+        + """        return 1;\n"""
+        + """    }\n"""
+        + """    FILE *output_file;\n"""
+        + """    output_file = fopen(argv[2], "w");\n"""
+        + """\n"""
+        + """    if (output_file == NULL)\n"""
+        + """    {\n"""
+        + """        perror("output_file opening");\n"""
+        + """        fclose(input_file);\n"""
+        + """        return 1;\n"""
+        + """    }\n"""
+        + """    while (fscanf(input_file, "{}\\n", {}) == NB_SENSORS)\n""".format(
+            string_format_input, string_input)
+        + """    {\n"""
+        + """        step(&N, inputs, outputs);\n"""
+        + """        fprintf(output_file, "{}\\n", {});\n""".format(
+            string_format_output, string_output)
+        + """    }\n"""
+        + """    fclose(output_file);\n"""
+        + """    fclose(input_file);\n"""
+        + """    return 0;\n"""
+        + """}\n"""
+    )
+
+def binary_main(N, block = 4096):
+    """
+    Binary frames : each step reads NB_SENSORS little-endian doubles and
+    writes NB_ACTORS little-endian doubles
+    Input is read by blocks of up to block frames, every complete frame
+    read is answered at once so the executable can also be driven frame by
+    frame through pipes
+    With a third argument --header the executable first writes the header
+    "NDNN", NB_SENSORS, NB_ACTORS, size of a value (3 uint32)
+    """
+    return(
+        """#include <fcntl.h>\n"""
+        + """#include <stdint.h>\n"""
+        + """#include <string.h>\n"""
+        + """#include <unistd.h>\n"""
+        + """\n"""
+        + """#define BLOCK {}\n""".format(block)
+        + """#define FRAME_IN (NB_SENSORS*sizeof(double))\n"""
+        + """#define FRAME_OUT (NB_ACTORS*sizeof(double))\n"""
+        + """\n"""
+        + """static double inputs[BLOCK*NB_SENSORS];\n"""
+        + """static double outputs[BLOCK*NB_ACTORS];\n"""
+        + """\n"""
+        + """int write_all(int file, const void *data, size_t size)\n"""
+        + """{\n"""
+        + """    ssize_t written;\n"""
+        + """    while (size > 0)\n"""
+        + """    {\n"""
+        + """        written = write(file, data, size);\n"""
+        + """        if (written <= 0)\n"""
+        + """        {\n"""
+        + """            return 1;\n"""
+        + """        }\n"""
+        + """        data = (const char *)data + written;\n"""
+        + """        size -= written;\n"""
+        + """    }\n"""
+        + """    return 0;\n"""
+        + """}\n"""
+        + """\n"""
+        + """int main(int argc, char * argv[])\n"""
+        + """{\n"""
+        + """    if (argc != 3 && !(argc == 4 && !strcmp(argv[3], "--header")))\n"""
+        + """    {\n"""
+        + """        printf("Use format : input_file output_file [--header]\\n");\n"""
+        + """        return 1;\n"""
+        + """    }\n"""
+        + """    static Network N = NETWORK;\n"""
+        + """    int input_file = open(argv[1], O_RDONLY);\n"""
+        + """    if (input_file < 0)\n"""
+        + """    {\n"""
+        + """        perror("input_file opening");\n"""
+        + """        return 1;\n"""
+        + """    }\n"""
+        + """    int output_file = open(argv[2], O_WRONLY | O_CREAT | O_TRUNC,"""
+            + """ 0644);\n"""
+        + """    if (output_file < 0)\n"""
+        + """    {\n"""
+        + """        perror("output_file opening");\n"""
+        + """        close(input_file);\n"""
+        + """        return 1;\n"""
+        + """    }\n"""
+        + """    if (argc == 4)\n"""
+        + """    {\n"""
+        + """        uint32_t header[3] = {NB_SENSORS, NB_ACTORS,"""
+            + """ sizeof(double)};\n"""
+        + """        if (write_all(output_file, "NDNN", 4)"""
+            + """ || write_all(output_file, header, sizeof(header)))\n"""
+        + """        {\n"""
+        + """            return 1;\n"""
+        + """        }\n"""
+        + """    }\n"""
+        + """    size_t filled = 0;\n"""
+        + """    size_t nb_frames;\n"""
+        + """    size_t k;\n"""
+        + """    ssize_t nb_read;\n"""
+        + """    while ((nb_read = read(input_file, (char *)inputs + filled,"""
+            + """ sizeof(inputs) - filled)) > 0)\n"""
+        + """    {\n"""
+        + """        filled += nb_read;\n"""
+        + """        nb_frames = filled/FRAME_IN;\n"""
+        + """        for (k=0; k<nb_frames; k++)\n"""
+        + """        {\n"""
+        + """            step(&N, inputs + k*NB_SENSORS, outputs + k*NB_ACTORS);\n"""
+        + """        }\n"""
+        + """        if (write_all(output_file, outputs, nb_frames*FRAME_OUT))\n"""
+        + """        {\n"""
+        + """            return 1;\n"""
+        + """        }\n"""
+        + """        filled -= nb_frames*FRAME_IN;\n"""
+        + """        memmove(inputs, (char *)inputs + nb_frames*FRAME_IN,"""
+            + """ filled);\n"""
+        + """    }\n"""
+        + """    close(output_file);\n"""
+        + """    close(input_file);\n"""
+        + """    return 0;\n"""
+        + """}\n"""
+    )
+
+def stream_process(file_name, inputs, header = True, nb_actors = None):
+    """
+    Pushes all the rows of inputs through an executable compiled with
+    io = "binary" and returns its outputs, one row per step
+    Without header, nb_actors must be given
+    """
+    command = [os.path.abspath(file_name), "/dev/stdin", "/dev/stdout"]
+    if header:
+        command.append("--header")
+    inputs = np.ascontiguousarray(inputs, dtype="<f8")
+    result = subprocess.run(command, input=inputs.tobytes(),
+                            stdout=subprocess.PIPE, check=True)
+    data = result.stdout
+    if header:
+        if data[:4] != b"NDNN":
+            raise(ValueError("{} did not answer with a header".format(
+                file_name)))
+        nb_sensors, nb_actors, value_size = np.frombuffer(
+            data[4:16], dtype="<u4")
+        if nb_sensors != inputs.shape[-1] or value_size != 8:
+            raise(ValueError("{} expects {} sensors of {} bytes".format(
+                file_name, nb_sensors, value_size)))
+        data = data[16:]
+    return(np.frombuffer(data, dtype="<f8").reshape((-1, nb_actors)))
+
+def shared_code(N, nb_iterations = 1, specialize = True, quantization = None):
+    """
+    The C code of a shared library doing exactly what Network.process does
+    (in double precision), with the ABI :
+        State *create(void) : a new state holding the values the Network was
+        compiled with (NULL if out of memory)
+        void destroy(State *S)
+        void init(State *S) : puts back the values the Network was compiled
+        with
+        void reset(State *S) : sets the values to zero
+        void step(State *S, int nb_iterations, const double *inputs,
+                  double *outputs)
+        void step_batch(State *S, int nb_iterations, int n,
+                        const double *inputs, double *outputs)
+            n steps one after the other, inputs and outputs are n rows
+        int get_nb_sensors(void), int get_nb_actors(void)
+        int get_nb_iterations(void) : the nb_iterations it was compiled with
+    Every state is independent, the library itself holds none
+    specialize = False keeps the generic iteration over the whole matrix
+    quantization : a Quantization of N, made with the same nb_iterations and
+    reset = N.reset_after_process, to compute in integers (specialize is
+    then not used)
+    """
+    if quantization is not None:
+        return(
+            """#include <math.h>\n"""
+            + """#include <stdint.h>\n"""
+            + """#include <stdlib.h>\n"""
+            + """#include <string.h>\n"""
+            + """\n"""
+            + c_defines(N)
+            + """#define NB_ITERATIONS {}\n""".format(nb_iterations)
+            + """\n"""
+            + """static const int16_t initial_values[NB_TOTAL_NEURONS] = {};\n""".format(
+                c_array(quantization.initial_values, int))
+            + """\n"""
+            + """typedef struct State\n"""
+            + """{\n"""
+            + """    int16_t values[NB_TOTAL_NEURONS];\n"""
+            + """}\n"""
+            + """State;\n"""
+            + """\n"""
+            + quantization.iteration("static void iteration(int16_t *values)",
+                                     "values")
+            + """static void network_reset(State *S)\n"""
+            + """{\n"""
+            + """    int i;\n"""
+            + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+            + """    {\n"""
+            + """        S->values[i] = bias[i];\n"""
+            + """    }\n"""
+            + """}\n"""
+            + """\n"""
+            + quantization.step(
+                "static void network_step(State *S, int nb_iterations,"
+                + " const double *inputs, double *outputs)", "S->values",
+                "iteration(S->values)", "nb_iterations",
+                N.reset_after_process)
+            + abi_code()
+        )
+    if specialize:
+        iteration = specialized_iteration(
+            N, "static void iteration(double *values)", "values")
+    else:
+        iteration = (
+            """static const double bias[NB_TOTAL_NEURONS] = {};\n""".format(
+                c_array(N.bias))
+            + """static const double weights[NB_TOTAL_NEURONS]"""
+                + """[NB_TOTAL_NEURONS] = {};\n""".format(
+                    c_array(np.asarray(N.weights)))
+            + """\n"""
+            + iteration_code(N)
+        )
+    return(
+        """#include <math.h>\n"""
+        + """#include <stdlib.h>\n"""
+        + """#include <string.h>\n"""
+        + """\n"""
+        + c_defines(N)
+        + """#define NB_ITERATIONS {}\n""".format(nb_iterations)
+        + """#define RESET_AFTER_PROCESS {}\n""".format(
+            int(N.reset_after_process))
+        + """\n"""
+        + """static const double initial_values[NB_TOTAL_NEURONS] = {};\n""".format(
+            c_array(N.values))
+        + """\n"""
+        + """typedef struct State\n"""
+        + """{\n"""
+        + """    double values[NB_TOTAL_NEURONS];\n"""
+        + """}\n"""
+        + """State;\n"""
+        + """\n"""
+        + c_activations("double")
+        + iteration
+        # The ABI functions only call static ones, a call from inside the
+        # library to an exported name could end up in another library
+        # (glibc has a step function for instance)
+        + """static void network_reset(State *S)\n"""
+        + """{\n"""
+        + """    memset(S->values, 0, sizeof(S->values));\n"""
+        + """}\n"""
+        + """\n"""
+        + """static void network_step(State *S, int nb_iterations,"""
+            + """ const double *inputs, double *outputs)\n"""
+        + """{\n"""
+        + """    int i;\n"""
+        + """    for (i=0; i<NB_SENSORS; i++)\n"""
+        + """    {\n"""
+        + """        S->values[i] += inputs[i];\n"""
+        + """    }\n"""
+        + """    for (i=0; i<nb_iterations; i++)\n"""
+        + """    {\n"""
+        + """        iteration(S->values);\n"""
+        + """    }\n"""
+        + """    memcpy(outputs, S->values + NB_TOTAL_NEURONS - NB_ACTORS,"""
+            + """ NB_ACTORS*sizeof(double));\n"""
+        + """    if (RESET_AFTER_PROCESS)\n"""
+        + """    {\n"""
+        + """        network_reset(S);\n"""
+        + """    }\n"""
+        + """}\n"""
+        + """\n"""
+        + abi_code()
+    )
+
+def abi_code():
+    """
+    The exported functions of a shared library, on top of the State type and
+    the static network_reset and network_step
+    """
+    return(
+        """void init(State *S)\n"""
+        + """{\n"""
+        + """    memcpy(S->values, initial_values, sizeof(S->values));\n"""
+        + """}\n"""
+        + """\n"""
+        + """State *create(void)\n"""
+        + """{\n"""
+        + """    State *S = malloc(sizeof(State));\n"""
+        + """    if (S != NULL)\n"""
+        + """    {\n"""
+        + """        init(S);\n"""
+        + """    }\n"""
+        + """    return S;\n"""
+        + """}\n"""
+        + """\n"""
+        + """void destroy(State *S)\n"""
+        + """{\n"""
+        + """    free(S);\n"""
+        + """}\n"""
+        + """\n"""
+        + """void reset(State *S)\n"""
+        + """{\n"""
+        + """    network_reset(S);\n"""
+        + """}\n"""
+        + """\n"""
+        + """int get_nb_sensors(void)\n"""
+        + """{\n"""
+        + """    return NB_SENSORS;\n"""
+        + """}\n"""
+        + """\n"""
+        + """int get_nb_actors(void)\n"""
+        + """{\n"""
+        + """    return NB_ACTORS;\n"""
+        + """}\n"""
+        + """\n"""
+        + """int get_nb_iterations(void)\n"""
+        + """{\n"""
+        + """    return NB_ITERATIONS;\n"""
+        + """}\n"""
+        + """\n"""
+        + """void step(State *S, int nb_iterations, const double *inputs,"""
+            + """ double *outputs)\n"""
+        + """{\n"""
+        + """    network_step(S, nb_iterations, inputs, outputs);\n"""
+        + """}\n"""
+        + """\n"""
+        + """void step_batch(State *S, int nb_iterations, int n,"""
+            + """ const double *inputs, double *outputs)\n"""
+        + """{\n"""
+        + """    int k;\n"""
+        + """    for (k=0; k<n; k++)\n"""
+        + """    {\n"""
+        + """        network_step(S, nb_iterations, inputs + k*NB_SENSORS,"""
+            + """ outputs + k*NB_ACTORS);\n"""
+        + """    }\n"""
+        + """}\n"""
+    )
+
+def iteration_code(N):
+    """
+    One generic iteration over the values of a state of the shared library
+    """
+    return(
+        """static void iteration(double *values)\n"""
+        + """{\n"""
+        + """    double x[NB_TOTAL_NEURONS];\n"""
+        + """    double sum;\n"""
+        + """    int i;\n"""
+        + """    int j;\n"""
+        + """    for (j=0; j<NB_TOTAL_NEURONS; j++)\n"""
+        + """    {\n"""
+        + """        x[j] = values[j] + bias[j];\n"""
+        + """    }\n"""
+        + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+        + """    {\n"""
+        + """        sum = 0;\n"""
+        + """        for (j=0; j<NB_TOTAL_NEURONS; j++)\n"""
+        + """        {\n"""
+        + """            sum += weights[i][j]*x[j];\n"""
+        + """        }\n"""
+        + """        values[i] = FUNCTION(sum);\n"""
+        + """    }\n"""
+        + """}\n"""
+        + """\n"""
+    )
+
+# Quantization
+
+class Quantization(object):
+    """
+    The integer version of a Network, calibrated on a trace of inputs :
+    the values are int16, each neuron with a scale of its own (the largest
+    value + bias it takes on the trace maps to 32767, so the bias is held
+    in the values) and the weights are int8, with a scale per row once
+    multiplied by the scales of the values
+    Sums are made in int32 (int64 if a row could overflow) then brought back
+    to the scale of their neuron by an integer multiplication and shift
+    Only segments, ramp and threshold, which are exact in integers, can be
+    quantized
+    nb_iterations and reset must be those of the compiled code (PERIOD and
+    False for an executable)
+    """
+    activations = {
+        "segments": "    t = (t > one[i]) ? one[i] : ((t < -one[i]) ? -one[i] : t);\n",
+        "ramp": "    t = (t > 0) ? t : 0;\n",
+        # On the sign of the sum, which does not suffer from the rescaling
+        "threshold": "    t = ((s[i] > 0) - (s[i] < 0))*one[i];\n",
+    }
+
+    def __init__(self, N, trace, nb_iterations = 1, reset = True):
+        if N.function.__name__ not in self.activations:
+            raise(ValueError("{} can not be quantized".format(
+                N.function.__name__)))
+        self.function_name = N.function.__name__
+        weights = np.asarray(N.weights)
+        # Calibration
+        values = np.array(N.values, dtype=np.float64)
+        peaks = np.maximum(np.abs(values + N.bias), np.abs(N.bias))
+        for input_data in np.asarray(trace, dtype=np.float64):
+            values[:N.nb_sensors] += input_data
+            for i in range(nb_iterations):
+                peaks = np.maximum(peaks, np.abs(values + N.bias))
+                values = N.function(weights @ (values + N.bias))
+            peaks = np.maximum(peaks, np.abs(values + N.bias))
+            if reset:
+                values = np.zeros(values.shape)
+        peaks[peaks == 0] = 1
+        self.scales = peaks/32767
+        # Weights
+        scaled_weights = weights*self.scales
+        self.row_scales = np.abs(scaled_weights).max(axis=1)/127
+        self.row_scales[self.row_scales == 0] = 1
+        self.weights = np.round(
+            scaled_weights/self.row_scales[:, None]).astype(np.int8)
+        bound = (32767*np.abs(self.weights.astype(np.int64)).sum(axis=1)).max()
+        self.accumulator = "int32_t" if bound < 2**31 else "int64_t"
+        # Rescaling : s*row_scale/scale ~ (s*multiplier) >> shift with
+        # multiplier on 15 bits
+        ratios = self.row_scales/self.scales
+        self.shifts = np.clip(14 - np.floor(np.log2(ratios)), 1, 62).astype(
+            np.int64)
+        self.multipliers = np.round(ratios*2.0**self.shifts).astype(np.int64)
+        self.bias = self.quantize(N.bias)
+        self.one = np.round(1/self.scales).astype(np.int64)
+        self.initial_values = self.quantize(N.values + N.bias)
+        self.blocks = [
+            (row, column, self.weights[row:row + len(array),
+                                       column:column + len(array[0])])
+            for row, column, array in weight_blocks(N)
+        ]
+
+    def quantize(self, values):
+        return(np.clip(np.round(values/self.scales), -32767, 32767).astype(
+            np.int64))
+
+    def iteration(self, signature, values, density = 0.25,
+                  unroll_limit = 256):
+        """
+        The integer iteration, values is the C expression of the int16
+        array of values it updates (see specialized_iteration)
+        """
+        tables = ""
+        body = ""
+        for k, (row, column, array) in enumerate(self.blocks):
+            block_tables, block_body = block_code(
+                k, row, column, array, "int8_t", int, density, unroll_limit)
+            tables += block_tables
+            body += block_body
+        return(
+            """static const int16_t bias[NB_TOTAL_NEURONS] = {};\n""".format(
+                c_array(self.bias, int))
+            + """static const int32_t one[NB_TOTAL_NEURONS] = {};\n""".format(
+                c_array(self.one, int))
+            + """static const int32_t multiplier[NB_TOTAL_NEURONS] = {};\n""".format(
+                c_array(self.multipliers, int))
+            + """static const int shift[NB_TOTAL_NEURONS] = {};\n""".format(
+                c_array(self.shifts, int))
+            + """static const double scale[NB_TOTAL_NEURONS] = {};\n""".format(
+                c_array(self.scales))
+            + tables
+            + """\n"""
+            + """{}\n""".format(signature)
+            + ("""{{\n"""
+            + """    {0} x[NB_TOTAL_NEURONS];\n"""
+            + """    {0} s[NB_TOTAL_NEURONS] = {{0}};\n"""
+            + """    {0} sum;\n"""
+            + """    int64_t t;\n"""
+            + """    int i;\n"""
+            + """    int j;\n"""
+            + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+            + """    {{\n"""
+            + """        x[i] = {1}[i];\n"""
+            + """    }}\n""").format(self.accumulator, values)
+            + body
+            + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+            + """    {\n"""
+            + """        t = ((int64_t)s[i]*multiplier[i]"""
+                + """ + ((int64_t)1 << (shift[i] - 1))) >> shift[i];\n"""
+            + """    """ + self.activations[self.function_name]
+            + """        t += bias[i];\n"""
+            + """        {}[i] = (t > 32767) ? 32767 :""".format(values)
+                + """ ((t < -32767) ? -32767 : t);\n"""
+            + """    }\n"""
+            + """}\n"""
+            + """\n"""
+        )
+
+    def step(self, signature, values, iteration, nb_iterations, reset):
+        """
+        The C step function : the double inputs are rounded to the scales of
+        the sensors and the actors are given back in double
+        With reset it ends with network_reset(S)
+        """
+        return(
+            """{}\n""".format(signature)
+            + """{\n"""
+            + """    int i;\n"""
+            + """    int64_t t;\n"""
+            + """    for (i=0; i<NB_SENSORS; i++)\n"""
+            + """    {\n"""
+            + """        t = {}[i] + llrint(inputs[i]/scale[i]);\n""".format(
+                values)
+            + """        {}[i] = (t > 32767) ? 32767 :""".format(values)
+                + """ ((t < -32767) ? -32767 : t);\n"""
+            + """    }\n"""
+            + """    for (i=0; i<{}; i++)\n""".format(nb_iterations)
+            + """    {\n"""
+            + """        {};\n""".format(iteration)
+            + """    }\n"""
+            + """    for (i=NB_TOTAL_NEURONS - NB_ACTORS; i<NB_TOTAL_NEURONS;"""
+                + """ i++)\n"""
+            + """    {\n"""
+            + """        outputs[i - NB_TOTAL_NEURONS + NB_ACTORS] ="""
+                + """ ({}[i] - bias[i])*scale[i];\n""".format(values)
+            + """    }\n"""
+            + """    network_reset(S);\n"""*reset
+            + """}\n"""
+            + """\n"""
+        )
+
+
+def quantization_error(N, file_name, trace, target = "executable",
+                       nb_iterations = 1, io = "text"):
+    """
+    Runs the trace through both the compiled file and (a copy of) N
+    Returns the largest and the mean absolute difference of their outputs
+    """
+    trace = np.asarray(trace, dtype=np.float64)
+    reference = copy.deepcopy(N)
+    if target == "executable":
+        reference.reset_after_process = False
+        nb_iterations = N.period
+    expected = np.array([np.array(reference.process(input_data,
+                                                    nb_iterations))
+                         for input_data in trace])
+    if target == "shared":
+        outputs = Compiled_Network(file_name).process_batch(trace)
+    elif io == "binary":
+        outputs = stream_process(file_name, trace)
+    else:
+        directory = tempfile.mkdtemp()
+        input_name = os.path.join(directory, "inputs")
+        output_name = os.path.join(directory, "outputs")
+        np.savetxt(input_name, trace, fmt="%.17g")
+        subprocess.run([os.path.abspath(file_name), input_name, output_name],
+                       check=True)
+        outputs = np.loadtxt(output_name, ndmin=2)
+        shutil.rmtree(directory)
+    error = np.abs(outputs - expected)
+    return(error.max(), error.mean())
+
+# Native population
+
+def population_code(N):
+    """
+    The C code of a shared library iterating a whole Population of members
+    with the topology of N, with OpenMP threads over the members
+    The genomes (Network.genome) are one contiguous buffer, one row per
+    member, and so are the values :
+        void population_iteration(int nb_members, int nb_iterations,
+                                  const double *genomes, double *values)
+        void set_nb_threads(int n), int get_genome_size(void)
+    """
+    body = ""
+    offset = 0
+    for row, column, array in weight_blocks(N):
+        nb_rows, nb_columns = array.shape
+        body += (
+            """    for (i=0; i<{}; i++)\n""".format(nb_rows)
+            + """    {\n"""
+            + """        sum = 0;\n"""
+            + """        w = genome + {} + i*{};\n""".format(offset, nb_columns)
+            + """        for (j=0; j<{}; j++)\n""".format(nb_columns)
+            + """        {\n"""
+            + """            sum += w[j]*x[{} + j];\n""".format(column)
+            + """        }\n"""
+            + """        s[{} + i] += sum;\n""".format(row)
+            + """    }\n"""
+        )
+        offset += array.size
+    return(
+        """#include <math.h>\n"""
+        + """#include <stddef.h>\n"""
+        + """#include <omp.h>\n"""
+        + """\n"""
+        + c_defines(N)
+        + """#define NB_WEIGHTS {}\n""".format(offset)
+        + """#define GENOME_SIZE (NB_WEIGHTS + NB_TOTAL_NEURONS)\n"""
+        + """\n"""
+        + c_activations("double")
+        + """static void member_iteration(const double *genome,"""
+            + """ double *values)\n"""
+        + """{\n"""
+        + """    const double *bias = genome + NB_WEIGHTS;\n"""
+        + """    const double *w;\n"""
+        + """    double x[NB_TOTAL_NEURONS];\n"""
+        + """    double s[NB_TOTAL_NEURONS] = {0};\n"""
+        + """    double sum;\n"""
+        + """    int i;\n"""
+        + """    int j;\n"""
+        + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+        + """    {\n"""
+        + """        x[i] = values[i] + bias[i];\n"""
+        + """    }\n"""
+        + body
+        + """    for (i=0; i<NB_TOTAL_NEURONS; i++)\n"""
+        + """    {\n"""
+        + """        values[i] = FUNCTION(s[i]);\n"""
+        + """    }\n"""
+        + """}\n"""
+        + """\n"""
+        + """void population_iteration(int nb_members, int nb_iterations,"""
+            + """ const double *genomes, double *values)\n"""
+        + """{\n"""
+        + """    int k;\n"""
+        + """    #pragma omp parallel for schedule(static)\n"""
+        + """    for (k=0; k<nb_members; k++)\n"""
+        + """    {\n"""
+        + """        int i;\n"""
+        + """        for (i=0; i<nb_iterations; i++)\n"""
+        + """        {\n"""
+        + """            member_iteration(genomes + (size_t)k*GENOME_SIZE,\n"""
+        + """                             values + (size_t)k*NB_TOTAL_NEURONS);\n"""
+        + """        }\n"""
+        + """    }\n"""
+        + """}\n"""
+        + """\n"""
+        + """void set_nb_threads(int n)\n"""
+        + """{\n"""
+        + """    omp_set_num_threads(n);\n"""
+        + """}\n"""
+        + """\n"""
+        + """int get_genome_size(void)\n"""
+        + """{\n"""
+        + """    return GENOME_SIZE;\n"""
+        + """}\n"""
+    )
+
+population_libraries = {}
+
+def population_library(N, cache = None):
+    """
+    The loaded library of population_code(N), compiled once per topology
+    in cache (a default Compile_Cache if None)
+    """
+    if cache is None:
+        cache = Compile_Cache()
+    file_name = cache.compile_code(
+        population_code(N), shared=True,
+        flags=("-O3", "-march=native", "-fopenmp")).result()
+    if file_name not in population_libraries:
+        library = ctypes.CDLL(os.path.abspath(file_name))
+        array = np.ctypeslib.ndpointer(dtype=np.float64, flags="C_CONTIGUOUS")
+        library.population_iteration.argtypes = [ctypes.c_int, ctypes.c_int,
+                                                 array, array]
+        library.population_iteration.restype = None
+        library.set_nb_threads.argtypes = [ctypes.c_int]
+        library.set_nb_threads.restype = None
+        population_libraries[file_name] = library
+    return(population_libraries[file_name])
+
+# Compilation
+
+native_targets = {}
+
+def target_machine(flags):
+    """
+    What code compiled with flags depends on in the machine : its
+    architecture, and with a "native" flag (-march=native) what gcc makes of
+    native on this CPU (its model and instruction sets), so that a cache
+    shared by several machines never gives one the code of another
+    """
+    if not any(["native" in flag for flag in flags]):
+        return(os.uname().machine)
+    flags = tuple([flag for flag in flags if "native" in flag])
+    if flags not in native_targets:
+        target = subprocess.run(["gcc", *flags, "-Q", "--help=target"],
+                                capture_output=True, text=True,
+                                check=True).stdout
+        native_targets[flags] = hashlib.sha256(target.encode()).hexdigest()
+    return("{} {}".format(os.uname().machine, native_targets[flags]))
+
+def default_flags(specialize = True):
+    """
+    The specialized code is made to be optimized, the generic one is
+    compiled as it always was
+    """
+    if specialize:
+        return(("-O3", "-march=native"))
+    return(())
+
+def network_code(N, target = "executable", nb_iterations = 1, io = "text",
+                 specialize = True, quantize = None):
+    """
+    The C code of N for a target of Network.compile, quantized on the trace
+    of inputs quantize if it is given
+    """
+    if target == "executable":
+        quantization = None
+        if quantize is not None:
+            quantization = Quantization(N, quantize, N.period, False)
+        return(executable_code(N, io, specialize, quantization))
+    if target == "shared":
+        quantization = None
+        if quantize is not None:
+            quantization = Quantization(N, quantize, nb_iterations,
+                                        N.reset_after_process)
+        return(shared_code(N, nb_iterations, specialize, quantization))
+    raise(ValueError("Unknown compile target {}".format(target)))
+
+def compile_c(c_code, file_name, shared = False, save_c = False,
+              flags = ("-O2", ), wait = True):
+    """
+    Writes c_code into file_name.c and compiles it into file_name
+    (a shared library if shared)
+    Returns the name of the compiled file, or the running Compilation if
+    not wait
+    """
+    compilation = Compilation(file_name)
+    compilation.start(c_code, shared, save_c, flags)
+    if wait:
+        return(compilation.result())
+    return(compilation)
+
+
+class Compilation(object):
+    """
+    A compilation running in the background, result waits for it and
+    returns the name of the compiled file
+    The compiler writes aside and the file is renamed at the end so that
+    a library already loaded from file_name is never overwritten while in
+    use and several processes can compile the same file at once
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.process = None
+
+    def start(self, c_code, shared = False, save_c = False,
+              flags = ("-O2", ), on_success = None):
+        self.temporary = "{}.{}.{}.tmp".format(self.file_name, os.getpid(),
+                                               id(self))
+        self.save_c = save_c
+        self.on_success = on_success
+        f = open(self.temporary + ".c", "w")
+        f.write(c_code)
+        f.close()
+        self.command = ["gcc", *flags, "-o", self.temporary,
+                        self.temporary + ".c", "-lm"]
+        if shared:
+            self.command[1:1] = ["-shared", "-fPIC"]
+        self.process = subprocess.Popen(self.command)
+
+    def done(self):
+        return(self.process is None or self.process.poll() is not None)
+
+    def result(self):
+        if self.process is not None:
+            returncode = self.process.wait()
+            self.process = None
+            try:
+                if returncode != 0:
+                    raise(subprocess.CalledProcessError(returncode,
+                                                        self.command))
+                os.replace(self.temporary, self.file_name)
+            finally:
+                if self.save_c:
+                    os.replace(self.temporary + ".c", self.file_name + ".c")
+                else:
+                    os.remove(self.temporary + ".c")
+            if self.on_success is not None:
+                self.on_success()
+        return(self.file_name)
+
+
+class Compile_Cache(object):
+    """
+    Compiled Networks stored in directory under the hash of everything their
+    code is made of (parameters, topology, activation, compile options), so
+    the same Network is never compiled twice, even by other processes (and
+    never given to another machine, see target_machine)
+    The compiler runs in the background (see Compilation)
+    Artifacts older than max_age seconds are removed, then the least
+    recently used ones until the cache is smaller than max_size bytes, but
+    never the ones it is still compiling or just compiled (even bigger than
+    max_size)
+    compile returns without waiting for the compiler, Network.compile with
+    a cache waits for it
+    """
+    version = 2 # To change when the generated code changes
+
+    def __init__(self, directory = "Compile_cache", max_size = 2**30,
+                 max_age = 30*24*3600):
+        self.directory = directory
+        self.max_size = max_size
+        self.max_age = max_age
+        self.pending = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, N, options):
+        regions = getattr(N, "regions", None)
+        if regions is not None:
+            regions = np.asarray(regions).tolist()
+        h = hashlib.sha256()
+        h.update(repr((
+            self.version, target_machine(options["flags"]), N.nb_sensors,
+            N.nb_actors, N.nb_add_neurons, N.period, N.function.__name__,
+            N.reset_after_process, getattr(N, "slices", None), regions,
+            sorted(options.items())
+        )).encode())
+        h.update(np.ascontiguousarray(N.genome(), dtype="<f8").tobytes())
+        h.update(np.ascontiguousarray(N.values, dtype="<f8").tobytes())
+        return(h.hexdigest())
+
+    def compile(self, N, target = "executable", nb_iterations = 1,
+                io = "text", specialize = True, flags = None,
+                quantize = None):
+        """
+        Same options as Network.compile, returns a Compilation which is
+        already done if the Network was in the cache
+        """
+        if flags == None:
+            flags = default_flags(specialize)
+        options = {"target": target, "io": io, "specialize": specialize,
+                   "flags": tuple(flags)}
+        if target == "shared":
+            options["nb_iterations"] = nb_iterations
+        if quantize is not None:
+            options["quantize"] = hashlib.sha256(np.ascontiguousarray(
+                quantize, dtype="<f8").tobytes()).hexdigest()
+        return(self.fetch(
+            self.key(N, options), target == "shared", flags,
+            lambda: network_code(N, target, nb_iterations, io, specialize,
+                                 quantize)))
+
+    def compile_code(self, c_code, shared = False, flags = ("-O2", )):
+        """
+        Compiles any C code, under the hash of the code itself
+        """
+        h = hashlib.sha256()
+        h.update(repr((self.version, target_machine(flags), shared,
+                       tuple(flags))).encode())
+        h.update(c_code.encode())
+        return(self.fetch(h.hexdigest(), shared, flags, lambda: c_code))
+
+    def fetch(self, key, shared, flags, make_code):
+        """
+        The Compilation of the artifact key, make_code only generates the
+        C code if it is not in the cache
+        """
+        if key in self.pending:
+            if self.pending[key].process is not None:
+                # Still compiling, or compiled and not collected yet
+                return(self.pending[key])
+            # The compiler failed
+            del self.pending[key]
+        file_name = os.path.join(self.directory, key)
+        if shared:
+            file_name += ".so"
+        compilation = Compilation(file_name)
+        if os.path.exists(file_name):
+            # Marks it as recently used
+            os.utime(file_name)
+            return(compilation)
+        compilation.start(make_code(), shared, False, flags,
+                          lambda: self.produced(key))
+        self.pending[key] = compilation
+        return(compilation)
+
+    def produced(self, key):
+        """
+        Called once the artifact key is compiled and in place
+        """
+        self.evict(self.pending.pop(key).file_name)
+
+    def evict(self, produced = None):
+        """
+        Removes the artifacts that are too old, then the least recently used
+        ones while the cache is too big
+        produced (the file just compiled) and the files of the compilations
+        still pending are kept : their callers have not loaded them yet
+        """
+        now = time.time()
+        kept = set([compilation.file_name
+                    for compilation in self.pending.values()])
+        kept.add(produced)
+        artifacts = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if (name.endswith(".tmp") or name.endswith(".tmp.c")
+                    or path in kept):
+                continue
+            try:
+                artifacts.append((os.path.getmtime(path),
+                                  os.path.getsize(path), path))
+            except FileNotFoundError:
+                # Removed by another process
+                pass
+        artifacts.sort()
+        size = sum([artifact[1] for artifact in artifacts])
+        for last_use, artifact_size, path in artifacts:
+            if now - last_use < self.max_age and size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= artifact_size
+
+    def size(self):
+        return(sum([os.path.getsize(os.path.join(self.directory, name))
+                    for name in os.listdir(self.directory)]))
+
+
+class Compiled_Network(object):
+    """
+    A Network compiled into a shared library (Network.compile with
+    target = "shared"), used with the same interface as Network.process
+    Each Compiled_Network has a state of its own in the library, so several
+    of them can use the same file (a file loaded once is never reloaded by
+    the same process, so compile new versions under new names)
+    """
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.library = ctypes.CDLL(os.path.abspath(file_name))
+        array = np.ctypeslib.ndpointer(dtype=np.float64, flags="C_CONTIGUOUS")
+        state = ctypes.c_void_p
+        self.library.create.argtypes = []
+        self.library.create.restype = state
+        self.library.destroy.argtypes = [state]
+        self.library.destroy.restype = None
+        self.library.init.argtypes = [state]
+        self.library.init.restype = None
+        self.library.reset.argtypes = [state]
+        self.library.reset.restype = None
+        self.library.step.argtypes = [state, ctypes.c_int, array, array]
+        self.library.step.restype = None
+        self.library.step_batch.argtypes = [state, ctypes.c_int, ctypes.c_int,
+                                            array, array]
+        self.library.step_batch.restype = None
+        self.nb_sensors = self.library.get_nb_sensors()
+        self.nb_actors = self.library.get_nb_actors()
+        self.nb_iterations = self.library.get_nb_iterations()
+        self.state = self.library.create()
+        if self.state == None:
+            raise(MemoryError("No memory for the state of {}".format(
+                file_name)))
+
+    def __del__(self):
+        if getattr(self, "state", None) != None:
+            self.library.destroy(self.state)
+            self.state = None
+
+    def process(self, input_data, nb_iterations = None):
+        """
+        What the network does, nb_iterations is the one it was compiled with
+        if None
+        """
+        if nb_iterations == None:
+            nb_iterations = self.nb_iterations
+        output = np.zeros((self.nb_actors))
+        self.library.step(
+            self.state, nb_iterations,
+            np.ascontiguousarray(input_data, dtype=np.float64), output)
+        return(output)
+
+    def process_batch(self, inputs, nb_iterations = None):
+        """
+        Processes the rows of inputs one after the other (like as many calls
+        to process) in a single call to the library
+        """
+        if nb_iterations == None:
+            nb_iterations = self.nb_iterations
+        inputs = np.ascontiguousarray(inputs, dtype=np.float64)
+        outputs = np.zeros((len(inputs), self.nb_actors))
+        self.library.step_batch(self.state, nb_iterations, len(inputs),
+                                inputs, outputs)
+        return(outputs)
+
+    def reset(self):
+        self.library.reset(self.state)
+
+    def init(self):
+        self.library.init(self.state)
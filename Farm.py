@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+"""
+Program written by Mattias Kockum
+On the 18/10/2026
+The aim of this program is to spread the evaluation of a Herd over worker
+processes of other machines connected over TCP
+Farm_Evaluator is the coordinator, it serves batches of jobs (a genome and
+the seeds of its tests) to the workers, which are started with
+    FARM_AUTHKEY=key python Farm.py worker host port
+in a directory where the Problem can be imported, key being the one the
+coordinator prints when it starts (in hexadecimal)
+A worker that stops sending heartbeats loses its batch to the others
+"""
+
+from CPU_AI import *
+from Islands import connect
+from multiprocessing.connection import Listener
+from multiprocessing import AuthenticationError
+import os
+import sys
+import traceback
+
+
+# Messages (pickled tuples) :
+#   coordinator -> worker
+#       ("spec", factory, template, heartbeat)
+#       ("batch", jobs) with jobs a list of (key, genome, seeds)
+#       ("stop", )
+#   worker -> coordinator
+#       ("heartbeat", )
+#       ("result", [(key, score), ...])
+#       ("error", traceback)
+
+def farm_worker(address, authkey):
+    """
+    Evaluates the batches of the coordinator at address until it stops
+    authkey is the one of the coordinator (Farm_Evaluator.authkey)
+    A worker is the only one of its machine : the Thread_Budget of the
+    machine gives its BLAS the cores the Networks can use
+    """
+    connection = connect(address, authkey)
+    budget = Thread_Budget()
+    lock = threading.Lock()
+    beating = []
+    def beat(heartbeat):
+        while True:
+            time.sleep(heartbeat)
+            try:
+                with lock:
+                    connection.send(("heartbeat", ))
+            except OSError:
+                return
+    while True:
+        try:
+            message = connection.recv()
+        except (EOFError, OSError):
+            break
+        if message[0] == "spec":
+            factory, template, heartbeat = message[1:]
+            worker_start(factory, template)
+            budget.release()
+            budget.layout(template.nb_neurons, nb_workers=1)
+            budget.apply()
+            if beating == []:
+                beating.append(threading.Thread(target=beat,
+                                                args=(heartbeat, ),
+                                                daemon=True))
+                beating[0].start()
+        elif message[0] == "batch":
+            try:
+                answer = ("result", [(key, worker_score(genome, seeds))
+                                     for key, genome, seeds in message[1]])
+            except Exception:
+                answer = ("error", traceback.format_exc())
+            with lock:
+                connection.send(answer)
+        elif message[0] == "stop":
+            break
+    budget.release()
+    connection.close()
+
+
+class Farm_Evaluator(Evaluator):
+    """
+    An Evaluator whose workers connect over TCP to address (port 0 picks a
+    free port, see self.address once started)
+    Jobs are members (a genome and the seeds of its tests), batch_size of
+    them per message
+    Workers send a heartbeat every heartbeat seconds, a batch whose worker
+    stays silent for 3 heartbeats (or disconnects) goes back to the queue
+    The farm is started by the first evolve and kept until close, the
+    workers get the Problem (factory, Copy_Factory of it by default) and a
+    Network of the Herd whenever they change
+    The connections carry pickles, so only the workers that know authkey
+    are accepted, a random one is made if None and printed with the command
+    starting a worker when the farm starts
+    """
+    def __init__(self, address = ("127.0.0.1", 0), factory = None,
+                 batch_size = 4, heartbeat = 1.0, authkey = None):
+        self.address = address
+        self.factory = factory
+        self.batch_size = batch_size
+        self.heartbeat = heartbeat
+        self.print_authkey = authkey == None
+        if authkey == None:
+            authkey = os.urandom(32)
+        self.authkey = authkey
+        self.listener = None
+        self.spec = None
+        self.version = 0
+        self.signature = None
+        self.pending = queue.Queue()
+        self.results = queue.Queue()
+        self.submitted = {}
+        self.nb_workers = 0
+        self.nb_reassigned = 0
+        self.closed = False
+
+    def start(self, Herd):
+        template = copy.deepcopy(Herd.members[0])
+        signature = (id(Herd.Problem), len(template.genome()))
+        if signature != self.signature:
+            factory = self.factory
+            if factory == None:
+                factory = Copy_Factory(Herd.Problem)
+            # A new version of the spec, sent to each worker before its next
+            # batch
+            self.signature = signature
+            self.version += 1
+            self.spec = (self.version, factory, template)
+        if self.listener == None:
+            self.listener = Listener(self.address, authkey=self.authkey)
+            self.address = self.listener.address
+            threading.Thread(target=self.accept, daemon=True).start()
+            if self.print_authkey:
+                print("Start the workers with : FARM_AUTHKEY={} python"
+                      " Farm.py worker {} {}".format(self.authkey.hex(),
+                                                     *self.address))
+
+    def accept(self):
+        while not self.closed:
+            try:
+                connection = self.listener.accept()
+            except AuthenticationError:
+                # Someone without the authkey
+                continue
+            except (OSError, EOFError):
+                if self.closed:
+                    return
+                continue
+            threading.Thread(target=self.serve, args=(connection, ),
+                             daemon=True).start()
+
+    def serve(self, connection):
+        """
+        Hands batches to one worker until it is lost or the farm closes
+        """
+        self.nb_workers += 1
+        version = None
+        while not self.closed:
+            try:
+                batch = self.pending.get(timeout=self.heartbeat)
+            except queue.Empty:
+                continue
+            try:
+                # The heartbeats of an idle worker
+                while connection.poll():
+                    connection.recv()
+                if version != self.spec[0]:
+                    version = self.spec[0]
+                    connection.send(("spec", ) + self.spec[1:]
+                                    + (self.heartbeat, ))
+                connection.send(("batch", batch))
+                while True:
+                    if not connection.poll(3*self.heartbeat):
+                        raise(TimeoutError("Worker lost"))
+                    message = connection.recv()
+                    if message[0] != "heartbeat":
+                        break
+            except (OSError, EOFError, TimeoutError):
+                self.nb_reassigned += 1
+                self.pending.put(batch)
+                break
+            if message[0] == "error":
+                self.results.put((None, RuntimeError(message[1])))
+                continue
+            for key, score in message[1]:
+                self.results.put((key, score))
+        self.nb_workers -= 1
+        if self.closed:
+            try:
+                connection.send(("stop", ))
+            except OSError:
+                pass
+        connection.close()
+
+    def dispatch(self, jobs):
+        for i in range(0, len(jobs), self.batch_size):
+            self.pending.put(jobs[i:i + self.batch_size])
+
+    def collect(self):
+        key, score = self.results.get()
+        if isinstance(score, BaseException):
+            raise(score)
+        return(key, score)
+
+    def evaluate(self, Herd):
+        self.dispatch([
+            (index, member.genome(),
+             [random_seed(Herd.run, Herd.generation, index, i)
+              for i in range(Herd.nb_tests)])
+            for index, member in enumerate(Herd.members)
+        ])
+        score = np.zeros(Herd.size)
+        done = set()
+        while len(done) < Herd.size:
+            index, member_score = self.collect()
+            score[index] = member_score
+            done.add(index)
+        return(score)
+
+    def submit(self, Herd, member, seeds):
+        self.submitted[id(member)] = member
+        self.dispatch([(id(member), member.genome(), seeds)])
+
+    def result(self):
+        key, score = self.collect()
+        return(self.submitted.pop(key), score)
+
+    def report(self):
+        return("workers : {}, reassigned batches : {}".format(
+            self.nb_workers, self.nb_reassigned))
+
+    def close(self):
+        """
+        Stops the workers and the farm
+        """
+        self.closed = True
+        if self.listener != None:
+            self.listener.close()
+            self.listener = None
+
+
+def main():
+    if (len(sys.argv) >= 4 and sys.argv[1] == "worker"
+        and "FARM_AUTHKEY" in os.environ):
+        farm_worker((sys.argv[2], int(sys.argv[3])),
+                    bytes.fromhex(os.environ["FARM_AUTHKEY"]))
+    else:
+        print("Usage : FARM_AUTHKEY=key python Farm.py worker host port")
+
+if __name__ == "__main__":
+    main()
@@ -89,7 +89,7 @@ class Gan(Problem):
         returns noise
         """
         print("Warning  : state was not fully configured")
-        return(np.random.rand((1)))
+        return(self.random.rand((1)))
 
     # Other state related functions should be there
 
@@ -9,8 +9,8 @@ The training is parallelized
 
 # Necessary
 from AI import *
-import pyopencl as cl
 from GPU_code_maker import *
+# pyopencl is only imported by the OpenCL_Backend
 # Useful for compiling Network in machine code
 import os
 # Useful for easy data visualisation
@@ -35,25 +35,15 @@ def mean(array, n=1):
 # Members are put in form of a list [biais...weights...]
 # (size = nb_neurons*(nb_neurons + 1))
 
-def prob_reproduction(X):
-    """
-    A weird looking function for parallelization
-    X[0] is a group of members
-    X[1] is their respective probability of being copied
-    X[2] = mutation_coefficent
-    X[3] = mutation_amplitude
-    returns the mutation of the chosen one
-    """
-    return(np.random.choice(X[0], p=X[1]).mutate(X[2], X[3]))
-
 def evaluate(X):
     """
     Another weird looking function
     X[0] is a problem
     X[1] is a network
+    X[2] is the seed of the test (see Random.random_seed)
     returns the score of the network
     """
-    np.random.seed()
+    np.random.seed(X[2])
     X[0].reset()
     X[1].reset()
     return_value = X[0].experience(X[1])
@@ -75,10 +65,100 @@ class GPU_Problem(Problem):
         return("This should be some kernel code")
 
 
+class Kernel_Backend(object):
+    """
+    What runs the experience kernel of a GPU_Herd
+    experience takes the packed Kernel_inputs, one row per test of a member :
+        [Problem.Kernel_inputs row, GPU_Network.flatten of the member]
+    and returns one score per row
+    """
+    def __init__(self, Herd, Problem):
+        self.Herd = Herd
+        self.Problem = Problem
+
+    def experience(self, kernel_inputs):
+        raise(NotImplementedError)
+
+
+class NumPy_Backend(Kernel_Backend):
+    """
+    The kernel contract on the CPU : the rows are unpacked into a Population
+    (one member per row) and given with their problem inputs to
+    Problem.numpy_experience(problem_inputs, Population), the vectorized
+    twin of the C kernel that must return one score per row
+    """
+    def __init__(self, Herd, Problem):
+        Kernel_Backend.__init__(self, Herd, Problem)
+        if not hasattr(Problem, "numpy_experience"):
+            raise(ValueError("{} has no numpy_experience".format(
+                Problem.__name__())))
+        # Flattened genomes are dense whatever the members are
+        self.template = Network(Herd.nb_sensors, Herd.nb_actors,
+                                Herd.nb_add_neurons, Herd.period,
+                                Herd.function, Herd.reset_after_process)
+        self.nb_neurons = self.template.nb_neurons
+
+    def experience(self, kernel_inputs):
+        kernel_inputs = np.asarray(kernel_inputs, dtype=np.float64)
+        genome_size = self.nb_neurons*(self.nb_neurons + 1)
+        problem_inputs = kernel_inputs[:, :-genome_size]
+        flat = kernel_inputs[:, -genome_size:]
+        population = Population([self.template])
+        population.select(np.zeros(len(kernel_inputs), dtype=int))
+        # flatten is [bias, weights], the genome [weights, bias]
+        population.genome[:, :-self.nb_neurons] = flat[:, self.nb_neurons:]
+        population.genome[:, -self.nb_neurons:] = flat[:, :self.nb_neurons]
+        return(np.asarray(
+            self.Problem.numpy_experience(problem_inputs, population),
+            dtype=np.float64))
+
+
+class OpenCL_Backend(Kernel_Backend):
+    """
+    The kernel compiled by OpenCL (needs pyopencl, a device and the kernel
+    sources : Kernel_AI.c and Problem.Kernel_code)
+    """
+    def __init__(self, Herd, Problem):
+        Kernel_Backend.__init__(self, Herd, Problem)
+        import pyopencl as cl
+        self.cl = cl
+        platform = cl.get_platforms()[0]
+        device = platform.get_devices()[0]
+        self.context = cl.Context([device])
+        self.queue = cl.CommandQueue(self.context)
+        definitions = defines(Herd.nb_sensors, Herd.nb_actors,
+                              Herd.nb_add_neurons, Herd.period,
+                              Herd.function.__name__)
+        AI_code = C_to_string("Kernel_AI.c")
+        code = definitions + AI_code + Problem.Kernel_code()
+        self.kernel_program = cl.Program(self.context, code).build()
+
+    def experience(self, kernel_inputs):
+        mf = self.cl.mem_flags
+        kernel_inputs = np.ascontiguousarray(kernel_inputs, dtype=np.float64)
+        Kernel_inputs_buffer = self.cl.Buffer(
+            self.context, mf.READ_ONLY | mf.COPY_HOST_PTR,
+            hostbuf=kernel_inputs)
+        score = np.zeros((len(kernel_inputs), ))
+        score_buffer = self.cl.Buffer(self.context, mf.WRITE_ONLY,
+                                      score.nbytes)
+        self.kernel_program.experience(
+            self.queue, (len(kernel_inputs), ), None,
+            Kernel_inputs_buffer, score_buffer)
+        self.cl.enqueue_copy(self.queue, score, score_buffer)
+        return(score)
+
+
 class GPU_Herd(Herd):
     """
     Herd of networks that evolve by reproducing
+    Every test of every member is evaluated in one call to the experience
+    kernel, run by backend (NumPy_Backend or OpenCL_Backend)
     """
+    def __init__(self, *args, backend = NumPy_Backend, **kwargs):
+        Herd.__init__(self, *args, **kwargs)
+        self.backend = backend
+
     def make_members(self, kwargs):
         self.members = [
             GPU_Network(self.nb_sensors, self.nb_actors, self.nb_add_neurons,
@@ -89,113 +169,32 @@ class GPU_Herd(Herd):
 
     def evolve(self, problem, nb_generations=1):
         """
-        The idea is to make the AI evolve by aproximating the gradient descent
-        Opens and closes the score output file multiple times so that it's
-        possible to see what's going on in during the training
+        Same as Herd.evolve, with the performances computed by the kernel
         """
-        # Saving problem
         if problem == None:
             # The empty problem, just here for quick tests
-            self.Problem = GPU_Problem()
-        else:
-            self.Problem = problem
-        # Paralellization values
-        platform = cl.get_platforms()[0]
-        device = platform.get_devices()[0]
-        context = cl.Context([device])
-        queue = cl.CommandQueue(context)
-        mf = cl.mem_flags
-        definitions = defines(self.nb_sensors, self.nb_actors,
-                              self.nb_add_neurons, self.period,
-                              self.function.__name__)
-        AI_code = C_to_string("Kernel_AI.c")
-        code = definitions + AI_code + self.Problem.Kernel_code()
-        kernel_program = cl.Program(context, code).build()
-        # Opening score file
-        score_file = open(self.Problem.__name__() + "_score" + self.date, "w")
-        score_file.write(
-            "score\n"
-            + "number of added neurons : {}\n".format(self.nb_add_neurons)
-            + "period : {}\n".format(self.period)
-            + "size : {}\n".format(self.size)
-            + "mutation coefficent : {}\n".format(self.mutation_coefficent)
-            + "mutation_amplitude : {}\n".format(self.mutation_amplitude)
-            + "number of tests : {}\n".format(self.nb_tests)
-            + "number of generations to proceed : {}\n".format(nb_generations)
-        )
-        score_file.close()
-        # Display instruction
-        """
-        for pb in self.Problem_pool:
-            pb.do_display = False
-        if self.do_display:
-            self.Problem_pool[0].do_display = True
-        """
-        # Evolution
-        for generation in range(nb_generations):
-            # Initialization of values and buffers
-            Problem_inputs = self.Problem.Kernel_inputs(self.size*self.nb_tests)
-            Network_inputs = []
-            for member in self.members:
-                Network_values = []
-                for value in member.flatten():
-                    Network_values.append(value)
-                Network_inputs.append(Network_values)
-            Kernel_inputs = []
-            for i in range(self.nb_tests*self.size):
-                Kernel_input = []
-                Kernel_input += Problem_inputs[i]
-                Kernel_input += Network_inputs[i%(self.nb_tests*self.size)]
-                Kernel_inputs.append(Kernel_input)
-            Kernel_inputs_buffer = cl.Buffer(context,
-                                             mf.READ_ONLY | mf.COPY_HOST_PTR,
-                                             hostbuf=np.array(Kernel_inputs))
-            score = np.zeros((self.size*self.nb_tests, ))
-            score_buffer = cl.Buffer(context, mf.WRITE_ONLY, score.nbytes)
-            # Evaluation of performances
-            kernel_program.experience(
-                queue, Kernel_inputs.shape, None,
-                Kernel_inputs_buffer, score_buffer)
-            # Reproduction (with mutation) of Networks
-            self.reproduce(proba_reproduction)
-            # Saves the scores
-            self.max_score = max(self.score)
-            self.max_score_index = self.score.index(self.max_score)
-            self.array_scores.append(self.max_score)
-            # Saves one Network and the score evolution
-            self.members[self.max_score_index].save(
-                self.Problem.__name__() + "_Network" + self.date, "w", False)
-            score_file = open(
-                self.Problem.__name__() + "_score" + self.date, "a"
-            )
-            score_file.write(
-                "generation n° {} : {} \n".format(
-                    generation, str(self.max_score)))
-            score_file.close()
-        score_file = open(self.Problem.__name__() + "_score" + self.date, "a")
-        score_file.write("End\n")
-        score_file.close()
-        return(self.array_scores)
-
-    def reproduce(self, proba_reproduction):
+            problem = GPU_Problem()
+        self.kernel = self.backend(self, problem)
+        return(Herd.evolve(self, problem, nb_generations))
+
+    def kernel_inputs(self):
         """
-        The copy of the successful networks with mutation
-        parallelized
+        Row i is the test i//size of the member i%size
         """
-        pool = mp.Pool()
-        new_members = (
-            pool.map(
-                prob_reproduction,
-                [(
-                    self.members,
-                    proba_reproduction,
-                    self.mutation_coefficent,
-                    self.mutation_amplitude
-                )]*self.size
-            )
-        )
-        self.members = new_members
-        pool.close()
+        np.random.seed(random_seed(self.run, self.generation, ALL_MEMBERS, 0))
+        Problem_inputs = np.array(
+            self.Problem.Kernel_inputs(self.size*self.nb_tests),
+            dtype=np.float64)
+        Network_inputs = np.array([member.flatten()
+                                   for member in self.members])
+        return(np.concatenate(
+            (Problem_inputs, np.tile(Network_inputs, (self.nb_tests, 1))),
+            axis=1))
+
+    def performances(self):
+        score = self.kernel.experience(self.kernel_inputs())
+        self.score = score.reshape((self.nb_tests, self.size)).mean(axis=0)
+        return(self.modif_score(self.score))
 
     def modif_score(self, score):
         """
@@ -231,7 +230,8 @@ class GPU_Network(Network):
     """
     def flatten(self):
         return(list(self.bias)
-               + list(self.weights.reshape((self.nb_neurons**2,))))
+               + list(np.asarray(self.weights).reshape(
+                   (self.nb_neurons**2,))))
 
 
 class TestBench(object):
@@ -19,8 +19,8 @@ def defines(nb_sensors, nb_actors, nb_add_neurons, period, function_name):
             + """#define NB_ADD_NEURONS {}\n""".format(nb_add_neurons)
             + """#define PERIOD {}\n""".format(period)
             + """#define FUNCTION {}\n""".format(function_name)
-            + """#define NB_TOTAL_NEURONS NB_SENSORS + NB_ADD_NEURONS"""
-                + """ + NB_ACTORS\n"""
+            + """#define NB_TOTAL_NEURONS (NB_SENSORS + NB_ADD_NEURONS"""
+                + """ + NB_ACTORS)\n"""
             + """\n""")
 
 def main(file_name):
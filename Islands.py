@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+"""
+Program written by Mattias Kockum
+On the 18/10/2026
+The aim of this program is to evolve several Herds at once (islands), in
+processes of this machine or on hosts reachable over TCP, that send each
+other their best members every few generations
+Only the genomes travel, as little-endian float64
+"""
+
+from AI import *
+import multiprocessing as mp
+from multiprocessing.connection import Listener, Client
+from multiprocessing import AuthenticationError
+import threading
+
+
+# A migration message :
+#   number of genomes, length of a genome (uint32)
+#   their scores then the genomes (little-endian float64)
+
+def pack_migrants(genomes, scores):
+    genomes = np.asarray(genomes, dtype="<f8")
+    return(struct.pack("<II", *genomes.shape)
+           + np.asarray(scores, dtype="<f8").tobytes()
+           + genomes.tobytes())
+
+def unpack_migrants(message):
+    """
+    Returns the genomes (one per row) and their scores
+    """
+    nb_genomes, length = struct.unpack("<II", message[:8])
+    scores = np.frombuffer(message, "<f8", nb_genomes, 8)
+    genomes = np.frombuffer(message, "<f8", nb_genomes*length,
+                            8 + 8*nb_genomes)
+    return(genomes.reshape((nb_genomes, length)), scores)
+
+def topology(name, nb_islands):
+    """
+    The (sender, receiver) pairs of islands of a topology :
+        "ring" : each island sends to the next one
+        "full" : each island sends to all the others
+    """
+    if name == "ring":
+        edges = [(i, (i + 1)%nb_islands) for i in range(nb_islands)]
+    elif name == "full":
+        edges = [(i, j) for i in range(nb_islands) for j in range(nb_islands)]
+    else:
+        raise(ValueError("Unknown topology {}".format(name)))
+    return([(i, j) for i, j in edges if i != j])
+
+
+class Migration(object):
+    """
+    Herd.migration of an island : every every generations it sends its top
+    best members to the islands of outputs and its worst members are
+    replaced by the ones received from inputs (connections that have
+    send_bytes and recv_bytes, through pipes or TCP)
+    The best top members are never replaced
+    The inputs are read in a fixed order so that a run does not depend on
+    which island is the fastest
+    """
+    def __init__(self, outputs, inputs, every = 10, top = 1):
+        self.outputs = outputs
+        self.inputs = inputs
+        self.every = every
+        self.top = top
+        self.nb_migrants = 0
+
+    def __call__(self, Herd):
+        if (Herd.generation + 1)%self.every != 0:
+            return
+        Herd.score = np.array(Herd.score, dtype=float)
+        best = np.argsort(-Herd.score, kind="stable")[:self.top]
+        message = pack_migrants([Herd.members[i].genome() for i in best],
+                                Herd.score[best])
+        # Sent from threads so that islands sending to each other at the
+        # same time do not wait for each other
+        senders = [threading.Thread(target=output.send_bytes,
+                                    args=(message, ))
+                   for output in self.outputs]
+        for sender in senders:
+            sender.start()
+        received = [unpack_migrants(connection.recv_bytes())
+                    for connection in self.inputs]
+        for sender in senders:
+            sender.join()
+        if received == []:
+            return
+        genomes = np.concatenate([genomes for genomes, scores in received])
+        scores = np.concatenate([scores for genomes, scores in received])
+        nb_migrants = min(len(genomes), Herd.size - self.top)
+        worst = np.argsort(Herd.score, kind="stable")[:nb_migrants]
+        for index, genome, score in zip(worst, genomes, scores):
+            Herd.members[index].set_genome(genome)
+            Herd.score[index] = score
+        self.nb_migrants += nb_migrants
+
+
+def run_island(index, herd_factory, problem_factory, nb_generations,
+               outputs, inputs, every = 10, top = 1, run = None):
+    """
+    Evolves the island index, returns its scores
+    Its score and save files end with _island<index>, its run number is
+    run + index (if run is given)
+    """
+    herd = herd_factory()
+    if run != None:
+        herd.run = (run + index)%2**32
+    herd.date += "_island{}".format(index)
+    herd.migration = Migration(outputs, inputs, every, top)
+    return(herd.evolve(problem_factory(), nb_generations))
+
+def island_process(results, index, *args):
+    try:
+        results.put((index, run_island(index, *args)))
+    except Exception as error:
+        results.put((index, error))
+        raise
+
+
+class Islands(object):
+    """
+    Islands evolving in processes of this machine, linked by pipes
+    herd_factory and problem_factory are picklable functions without
+    argument that return a Herd and a Problem (a Problem class,
+    functools.partial(Herd, ...))
+    topology is "ring" or "full" (see topology), every and top are the ones
+    of Migration, the islands are not daemons so their Herds can have pools
+    """
+    def __init__(self, herd_factory, problem_factory, nb_islands = 4,
+                 topology = "ring", every = 10, top = 1, run = None):
+        self.herd_factory = herd_factory
+        self.problem_factory = problem_factory
+        self.nb_islands = nb_islands
+        self.topology = topology
+        self.every = every
+        self.top = top
+        self.run = run
+
+    def evolve(self, nb_generations = 1):
+        """
+        Returns the scores of each island
+        """
+        outputs = [[] for i in range(self.nb_islands)]
+        inputs = [[] for i in range(self.nb_islands)]
+        for sender, receiver in topology(self.topology, self.nb_islands):
+            reader, writer = mp.Pipe(False)
+            outputs[sender].append(writer)
+            inputs[receiver].append(reader)
+        results = mp.Queue()
+        processes = [
+            mp.Process(target=island_process,
+                       args=(results, i, self.herd_factory,
+                             self.problem_factory, nb_generations, outputs[i],
+                             inputs[i], self.every, self.top, self.run))
+            for i in range(self.nb_islands)
+        ]
+        for process in processes:
+            process.start()
+        scores = [None]*self.nb_islands
+        for i in range(self.nb_islands):
+            index, result = results.get()
+            if isinstance(result, BaseException):
+                for process in processes:
+                    process.terminate()
+                raise(result)
+            scores[index] = result
+        for process in processes:
+            process.join()
+        return(scores)
+
+
+def connect(address, authkey, timeout = 60):
+    """
+    Connects to an island, waiting for it to listen
+    """
+    start = time.time()
+    while True:
+        try:
+            return(Client(address, authkey=authkey))
+        except ConnectionRefusedError:
+            if time.time() - start > timeout:
+                raise
+            time.sleep(0.1)
+
+def tcp_island(index, addresses, herd_factory, problem_factory,
+               nb_generations, topology_name = "ring", every = 10, top = 1,
+               run = None, authkey = None):
+    """
+    The island index of addresses (a (host, port) per island) : each island
+    is started on its host with the same arguments but its index
+    It listens on its address and connects to the islands it sends to
+    authkey (bytes) is a secret shared by the islands and required : the
+    connections carry pickles, so whoever knows it can run code on them
+    Returns its scores
+    """
+    if not authkey:
+        raise(ValueError("tcp_island needs the authkey of the islands"))
+    edges = topology(topology_name, len(addresses))
+    senders = [i for i, j in edges if j == index]
+    inputs = {}
+    listener = Listener(addresses[index], authkey=authkey)
+    # Accepted while connecting, or two islands would wait for each other
+    def accept():
+        while len(inputs) < len(senders):
+            try:
+                connection = listener.accept()
+            except AuthenticationError:
+                # Someone without the authkey
+                continue
+            inputs[connection.recv()] = connection
+    accepting = threading.Thread(target=accept)
+    accepting.start()
+    outputs = []
+    for sender, receiver in edges:
+        if sender == index:
+            outputs.append(connect(addresses[receiver], authkey))
+            outputs[-1].send(index)
+    accepting.join()
+    listener.close()
+    try:
+        return(run_island(index, herd_factory, problem_factory,
+                          nb_generations, outputs,
+                          [inputs[i] for i in sorted(inputs)], every, top,
+                          run))
+    finally:
+        for connection in outputs + list(inputs.values()):
+            connection.close()
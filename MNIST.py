@@ -39,7 +39,7 @@ class MNIST(Problem):
         self.do_display = do_display
         self.classified = False
         self.output = np.zeros((10))
-        index = np.random.randint(0, LEN)
+        index = self.random.randint(0, LEN)
         self.image = TEST_IMAGES[index]
         self.squished_image = SQUISHED_IMAGES[index]
         self.number = TEST_LABELS[index]
@@ -58,6 +58,17 @@ class MNIST(Problem):
         self.reset()
         return(score)
 
+    def batch_experience(self, Population):
+        """
+        Shows one random image to every member of the Population at once
+        Returns the score of each member
+        """
+        indexes = self.random.randint(0, LEN, Population.size)
+        images = np.stack(list(SQUISHED_IMAGES[indexes]))
+        output = Population.process(images)
+        score = 1.0*(np.argmax(output, axis=1) == TEST_LABELS[indexes])
+        return(score)
+
     def end_condition(self):
         """
         True if the Problem is finished for whatever reason
@@ -127,6 +138,15 @@ class MNIST(Problem):
             inputs.append(i_input)
         return(inputs)
 
+    def numpy_experience(self, inputs, Population):
+        """
+        What the kernel does, on rows of Kernel_inputs and the Population
+        of their members (see GPU_AI.NumPy_Backend)
+        """
+        output = Population.process(inputs[:, 1:])
+        score = 1.0*(np.argmax(output, axis=1) == inputs[:, 0])
+        return(score)
+
     def reset(self):
         """
         Resets the problem
@@ -161,7 +181,8 @@ def main():
     P = MNIST(False)
     H = Herd(nb_sensors, nb_actors, nb_add_neurons, period, function,
              reset_after_process, size, mutation_coefficient,
-             mutation_amplitude, nb_tests, do_display)
+             mutation_amplitude, nb_tests, do_display,
+             slices=slices, regions=regions)
     H.evolve(P, nb_generations)
 
 if __name__ == "__main__":
@@ -1,4 +1,83 @@
-void randomNext(double *seed)
+/*
+Program written by Mattias Kockum
+On the 18/10/2026
+The aim of this program is to give C and kernel code the same random numbers
+as Random.py : numbers are computed from their address
+    (run, stream, generation, member, test, step)
+by the counter-based generator Philox4x32-10
+*/
+
+#ifdef __OPENCL_VERSION__
+typedef uint uint32_t;
+typedef ulong uint64_t;
+#else
+#include <stdint.h>
+#include <math.h>
+#endif
+
+#define PHILOX_M0 0xD2511F53
+#define PHILOX_M1 0xCD9E8D57
+#define PHILOX_W0 0x9E3779B9
+#define PHILOX_W1 0xBB67AE85
+
+void philox(const uint32_t counter[4], const uint32_t key[2], uint32_t out[4])
 {
-	*seed = sin(1/(*seed%0.1));
+	uint32_t c0 = counter[0], c1 = counter[1];
+	uint32_t c2 = counter[2], c3 = counter[3];
+	uint32_t k0 = key[0], k1 = key[1];
+	uint64_t p0;
+	uint64_t p1;
+	int i;
+	for (i=0; i<10; i++)
+	{
+		if (i > 0)
+		{
+			k0 += PHILOX_W0;
+			k1 += PHILOX_W1;
+		}
+		p0 = (uint64_t)PHILOX_M0*c0;
+		p1 = (uint64_t)PHILOX_M1*c2;
+		c0 = (uint32_t)(p1 >> 32) ^ c1 ^ k0;
+		c1 = (uint32_t)p1;
+		c2 = (uint32_t)(p0 >> 32) ^ c3 ^ k1;
+		c3 = (uint32_t)p0;
+	}
+	out[0] = c0;
+	out[1] = c1;
+	out[2] = c2;
+	out[3] = c3;
+}
+
+void random_bits(uint32_t run, uint32_t stream, uint32_t generation,
+                 uint32_t member, uint32_t test, uint32_t step,
+                 uint32_t out[4])
+{
+	uint32_t counter[4] = {generation, member, test, step};
+	uint32_t key[2] = {run, stream};
+	philox(counter, key, out);
+}
+
+double to_uniform(uint32_t a, uint32_t b)
+{
+	return ((uint64_t)(a >> 5)*67108864 + (b >> 6))*(1.0/9007199254740992.0);
+}
+
+double random_uniform(uint32_t run, uint32_t stream, uint32_t generation,
+                      uint32_t member, uint32_t test, uint32_t step)
+{
+	uint32_t bits[4];
+	random_bits(run, stream, generation, member, test, step, bits);
+	return to_uniform(bits[0], bits[1]);
+}
+
+double random_normal(uint32_t run, uint32_t stream, uint32_t generation,
+                     uint32_t member, uint32_t test, uint32_t step)
+{
+	uint32_t bits[4];
+	double u1;
+	double u2;
+	random_bits(run, stream, generation, member, test, step, bits);
+	u1 = 1 - to_uniform(bits[0], bits[1]);
+	u2 = to_uniform(bits[2], bits[3]);
+	return sqrt(-2*log(u1))*cos(6.283185307179586*u2);
 }
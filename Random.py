@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+
+"""
+Program written by Mattias Kockum
+On the 18/10/2026
+The aim of this program is to give every part of the training the same
+random numbers, whatever runs it (Python, compiled C, kernels) and in
+whatever order
+Numbers are not drawn from a state but computed from their address
+    (run, stream, generation, member, test, step)
+by the counter-based generator Philox4x32-10, Random.c is its C twin
+"""
+
+import numpy as np
+
+
+# Streams keep the randomness of each use apart for the same address
+PROBLEM_STREAM = 0
+MUTATION_STREAM = 1
+SELECTION_STREAM = 2
+# The member of what concerns the whole Herd at once
+ALL_MEMBERS = 0xFFFFFFFF
+
+PHILOX_M = (0xD2511F53, 0xCD9E8D57)
+PHILOX_W = (0x9E3779B9, 0xBB67AE85)
+MASK = np.uint64(0xFFFFFFFF)
+
+
+def words(x):
+    return(np.asarray(x, dtype=np.uint64) & MASK)
+
+def philox(counter, key):
+    """
+    Philox4x32-10 of counters (4 words) under keys (2 words), as uint32
+    arrays that broadcast together
+    """
+    c0, c1, c2, c3 = [words(i) for i in counter]
+    k0, k1 = [words(i) for i in key]
+    m0, m1 = np.uint64(PHILOX_M[0]), np.uint64(PHILOX_M[1])
+    w0, w1 = np.uint64(PHILOX_W[0]), np.uint64(PHILOX_W[1])
+    shift = np.uint64(32)
+    for i in range(10):
+        if i > 0:
+            k0 = (k0 + w0) & MASK
+            k1 = (k1 + w1) & MASK
+        p0 = m0*c0
+        p1 = m1*c2
+        c0, c1, c2, c3 = ((p1 >> shift) ^ c1 ^ k0, p1 & MASK,
+                          (p0 >> shift) ^ c3 ^ k1, p0 & MASK)
+    return([c0.astype(np.uint32), c1.astype(np.uint32),
+            c2.astype(np.uint32), c3.astype(np.uint32)])
+
+def random_bits(run, generation, member, test, step, stream = PROBLEM_STREAM):
+    return(philox((generation, member, test, step), (run, stream)))
+
+def to_uniform(a, b):
+    """
+    A double of [0, 1) made of 53 bits of two words, exact in C too
+    """
+    a = np.asarray(a, dtype=np.uint64) >> np.uint64(5)
+    b = np.asarray(b, dtype=np.uint64) >> np.uint64(6)
+    return((a*np.uint64(67108864) + b)*2.0**-53)
+
+def uniform(run, generation, member, test, step, stream = PROBLEM_STREAM):
+    """
+    Uniform numbers of [0, 1) at the given addresses (they broadcast)
+    """
+    bits = random_bits(run, generation, member, test, step, stream)
+    return(to_uniform(bits[0], bits[1]))
+
+def normal(run, generation, member, test, step, stream = PROBLEM_STREAM):
+    """
+    Standard normal numbers at the given addresses (Box-Muller on the four
+    words, the same as Random.c up to the rounding of log and cos)
+    """
+    bits = random_bits(run, generation, member, test, step, stream)
+    u1 = 1 - to_uniform(bits[0], bits[1])
+    u2 = to_uniform(bits[2], bits[3])
+    return(np.sqrt(-2*np.log(u1))*np.cos(6.283185307179586*u2))
+
+def random_seed(run, generation, member, test, stream = PROBLEM_STREAM):
+    """
+    A seed for the numpy global generator, for Problems that draw from it
+    """
+    return(int(random_bits(run, generation, member, test, 0xFFFFFFFF,
+                           stream)[0]))
+
+def new_run():
+    """
+    A run number, the only number taken from the system
+    """
+    return(int(np.random.SeedSequence().entropy % 2**32))
+
+
+class Counter_Random(object):
+    """
+    Stands for a numpy Generator (random, normal, integers, choice) in the
+    mutation functions and in reproduce
+    The first dimension of a 2D shape is the member (from member on) and
+    the other is the step, so the numbers of a member do not depend on the
+    members drawn with it, a 1D shape is the steps of member
+    Each draw moves the steps forward by the number of steps it used, so
+    starting at step k gives the end of what a draw from 0 would give
+    """
+    def __init__(self, run = 0, generation = 0, member = 0, test = 0,
+                 stream = PROBLEM_STREAM, step = 0):
+        self.run = run
+        self.generation = generation
+        self.member = member
+        self.test = test
+        self.stream = stream
+        self.step = step
+
+    def addresses(self, size):
+        shape = ()
+        if size is not None:
+            shape = tuple([int(i) for i in np.atleast_1d(size)])
+        if len(shape) < 2:
+            members = self.member
+            steps = self.step + np.arange(int(np.prod(shape)))
+            self.step += int(np.prod(shape))
+            return(members, steps.reshape(shape), shape)
+        nb_steps = int(np.prod(shape[1:]))
+        members = (self.member + np.arange(shape[0]))[:, None]
+        steps = (self.step + np.arange(nb_steps))[None, :]
+        self.step += nb_steps
+        return(members, steps, shape)
+
+    def random(self, size = None):
+        members, steps, shape = self.addresses(size)
+        return(uniform(self.run, self.generation, members, self.test, steps,
+                       self.stream).reshape(shape))
+
+    def normal(self, loc = 0.0, scale = 1.0, size = None):
+        members, steps, shape = self.addresses(size)
+        return(loc + scale*normal(self.run, self.generation, members,
+                                  self.test, steps,
+                                  self.stream).reshape(shape))
+
+    def normal_at(self, loc, scale, size, indexes):
+        """
+        normal(loc, scale, size).ravel()[indexes] computing only the numbers
+        at indexes (flat indexes of an array of shape size)
+        """
+        members, steps, shape = self.addresses(size)
+        indexes = np.asarray(indexes, dtype=np.int64)
+        if len(shape) < 2:
+            members, steps = members, steps.ravel()[indexes]
+        else:
+            nb_steps = steps.shape[1]
+            members, steps = (members[indexes//nb_steps, 0],
+                              steps[0, indexes%nb_steps])
+        return(loc + scale*normal(self.run, self.generation, members,
+                                  self.test, steps, self.stream))
+
+    def bernoulli(self, size, p):
+        """
+        The flat indexes of the True of a mask of shape size whose elements
+        are True with probability p, each row (member) on its own
+        Only about p numbers per element are drawn : the gaps between two
+        Trues of a row are geometric
+        """
+        shape = tuple([int(i) for i in np.atleast_1d(size)])
+        if len(shape) < 2:
+            shape = (1, ) + shape
+        nb_rows, nb_columns = shape[0], int(np.prod(shape[1:]))
+        if p <= 0:
+            return(np.zeros((0), dtype=np.int64))
+        if p >= 1:
+            return(np.arange(nb_rows*nb_columns))
+        mean = p*nb_columns
+        chunk = int(mean + 4*np.sqrt(mean) + 16)
+        log_q = np.log1p(-p)
+        last = -np.ones((nb_rows), dtype=np.int64)
+        positions = []
+        while np.any(last < nb_columns):
+            gaps = np.floor(np.log(1 - self.random((nb_rows, chunk)))/log_q)
+            positions.append(
+                last[:, None] + np.cumsum(gaps.astype(np.int64) + 1, axis=1))
+            last = positions[-1][:, -1]
+        positions = np.concatenate(positions, axis=1)
+        rows, columns = np.nonzero(positions < nb_columns)
+        return(rows*nb_columns + positions[rows, columns])
+
+    def masked_normal(self, loc, scale, size, p):
+        """
+        Where bernoulli(size, p) is True, and normal numbers there
+        The normals of every element are set aside before the mask, so
+        they do not depend on how many numbers the other rows drew
+        """
+        shape = tuple([int(i) for i in np.atleast_1d(size)])
+        start = self.step
+        self.step += int(np.prod(shape[1:] if len(shape) > 1 else shape))
+        indexes = self.bernoulli(size, p)
+        end = self.step
+        self.step = start
+        values = self.normal_at(loc, scale, size, indexes)
+        self.step = end
+        return(indexes, values)
+
+    def integers(self, low, high = None, size = None):
+        if high is None:
+            low, high = 0, low
+        return(low + np.floor(self.random(size)*(high - low)).astype(int))
+
+    def choice(self, a, size = None, p = None):
+        """
+        Only for a number of elements a (like np.random.choice(a, size, p))
+        """
+        if p is None:
+            return(self.integers(0, a, size))
+        cumulated = np.cumsum(p)
+        cumulated /= cumulated[-1]
+        return(np.minimum(np.searchsorted(cumulated, self.random(size),
+                                          side="right"), a - 1))
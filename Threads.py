@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+"""
+Program written by Mattias Kockum
+On the 18/10/2026
+The aim of this program is to share the cores between the workers of an
+evaluation and the threads of their BLAS (np.matmul) and OpenMP, so that a
+pool of workers does not start a team of threads per worker
+The thread counts are set in the environment (for what is loaded after,
+the libraries read it once when they are loaded), for what is already
+loaded with threadpoolctl (any version from 2.1) and with the
+set_num_threads function of OpenBLAS, which the old threadpoolctl does not
+find in recent numpy wheels
+"""
+
+import ctypes
+import os
+try:
+    import threadpoolctl
+except ImportError:
+    threadpoolctl = None
+
+
+THREAD_VARIABLES = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS",
+                    "MKL_NUM_THREADS", "BLIS_NUM_THREADS",
+                    "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS"]
+
+
+def available_cores():
+    """
+    The cores this process may run on
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return(sorted(os.sched_getaffinity(0)))
+    return(list(range(os.cpu_count())))
+
+def openblas_threads():
+    """
+    The (get, set) number of threads functions of the OpenBLAS libraries
+    loaded in this process (numpy's one is named scipy_openblas in recent
+    wheels)
+    """
+    if not os.path.exists("/proc/self/maps"):
+        return([])
+    with open("/proc/self/maps") as maps:
+        paths = sorted({line.split()[-1] for line in maps
+                        if "openblas" in line.split()[-1].lower()})
+    names = [prefix + "{}_num_threads" + suffix
+             for prefix in ["openblas_", "scipy_openblas_"]
+             for suffix in ["", "64_"]]
+    functions = []
+    for path in paths:
+        try:
+            library = ctypes.CDLL(path)
+        except OSError:
+            continue
+        for name in names:
+            if hasattr(library, name.format("set")):
+                functions.append((getattr(library, name.format("get")),
+                                  getattr(library, name.format("set"))))
+                break
+    return(functions)
+
+def thread_limiter():
+    """
+    What limits the threads of the libraries already loaded :
+    "threadpoolctl", "OpenBLAS", both or None (then only the environment is
+    set, which changes nothing for the libraries already loaded)
+    """
+    limiters = []
+    if threadpoolctl != None:
+        limiters.append("threadpoolctl")
+    if openblas_threads() != []:
+        limiters.append("OpenBLAS")
+    if limiters == []:
+        return(None)
+    return(" and ".join(limiters))
+
+def limit_threads(nb_threads):
+    """
+    Limits BLAS and OpenMP to nb_threads threads
+    Returns what restore_threads needs to undo it
+    """
+    environment = {name: os.environ.get(name) for name in THREAD_VARIABLES}
+    for name in THREAD_VARIABLES:
+        os.environ[name] = str(nb_threads)
+    openblas = [(set_threads, get_threads())
+                for get_threads, set_threads in openblas_threads()]
+    limits = None
+    if threadpoolctl != None:
+        limits = threadpoolctl.threadpool_limits(nb_threads)
+    for set_threads, previous in openblas:
+        set_threads(nb_threads)
+    return((environment, limits, openblas))
+
+def restore_threads(saved):
+    environment, limits, openblas = saved
+    for name, value in environment.items():
+        if value == None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+    if limits != None:
+        # unregister before threadpoolctl 3
+        if hasattr(limits, "restore_original_limits"):
+            limits.restore_original_limits()
+        else:
+            limits.unregister()
+    for set_threads, nb_threads in openblas:
+        set_threads(nb_threads)
+
+
+class Thread_Budget(object):
+    """
+    Chooses the layout of an evaluation (nb_workers x nb_threads, at most
+    one thread per core) from the size of the Networks and applies it in
+    the processes that compute
+    A matmul of less than thread_neurons neurons per thread is too short to
+    be shared, so small Networks get one thread per worker and many
+    workers, big ones fewer workers with more threads
+    With affinity each worker is pinned to its own cores
+    """
+    thread_neurons = 512
+
+    def __init__(self, nb_cores = None, affinity = False):
+        self.cores = available_cores()
+        if nb_cores != None:
+            self.cores = self.cores[:nb_cores]
+        self.affinity = affinity
+        self.nb_workers = 1
+        self.nb_threads = 1
+        self.saved = None
+        self.saved_cores = None
+
+    def layout(self, nb_neurons, nb_workers = None, max_workers = None):
+        """
+        Sets and returns (nb_workers, nb_threads) for Networks of nb_neurons
+        nb_workers forces the number of workers, max_workers bounds it
+        """
+        nb_cores = len(self.cores)
+        needed = max(1, min(nb_cores, nb_neurons//self.thread_neurons))
+        if nb_workers == None:
+            nb_workers = max(1, nb_cores//needed)
+            if max_workers != None:
+                nb_workers = min(nb_workers, max_workers)
+        self.nb_workers = nb_workers
+        self.nb_threads = max(1, min(needed, nb_cores//nb_workers))
+        return(self.nb_workers, self.nb_threads)
+
+    def worker_cores(self, index = None):
+        """
+        The cores of the worker index, of all the workers if None
+        """
+        if index == None:
+            return(self.cores[:self.nb_workers*self.nb_threads])
+        start = (index%self.nb_workers)*self.nb_threads
+        return(self.cores[start:start + self.nb_threads])
+
+    def apply(self, index = None):
+        """
+        Called by the worker index (or by the process of all the workers if
+        None), release undoes it
+        """
+        if self.saved == None:
+            self.saved = limit_threads(self.nb_threads)
+        if self.affinity and hasattr(os, "sched_setaffinity"):
+            if self.saved_cores == None:
+                self.saved_cores = os.sched_getaffinity(0)
+            os.sched_setaffinity(0, self.worker_cores(index))
+
+    def release(self):
+        if self.saved != None:
+            restore_threads(self.saved)
+            self.saved = None
+        if self.saved_cores != None:
+            os.sched_setaffinity(0, self.saved_cores)
+            self.saved_cores = None
+
+    def __getstate__(self):
+        # What was applied here does not follow the budget to the workers
+        state = self.__dict__.copy()
+        state["saved"] = None
+        state["saved_cores"] = None
+        return(state)
+
+    def report(self):
+        limiter = thread_limiter()
+        if limiter == None:
+            limiter = "no limit applied, install threadpoolctl"
+        report = "layout : {} workers x {} threads ({})".format(
+            self.nb_workers, self.nb_threads, limiter)
+        if self.affinity:
+            report += ", pinned"
+        return(report)
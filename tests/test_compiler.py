@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pytest
+
+from AI import Network, segments
+import Compiler
+from Compiler import Compiled_Network, Compile_Cache
+
+
+def network(reset_after_process):
+    np.random.seed(2)
+    N = Network(3, 2, 6, 1, segments, reset_after_process)
+    N.set_genome(2*N.genome())
+    return(N)
+
+
+@pytest.mark.parametrize("reset_after_process", [True, False],
+                         ids=["reset", "kept"])
+@pytest.mark.parametrize("specialize", [True, False],
+                         ids=["specialized", "generic"])
+def test_same_outputs_as_network(tmp_path, specialize, reset_after_process):
+    N = network(reset_after_process)
+    C = Compiled_Network(N.compile(str(tmp_path/"net"), target="shared",
+                                   nb_iterations=2, specialize=specialize))
+    inputs = np.random.uniform(-1, 1, (20, 3))
+    for input_data in inputs[:10]:
+        assert np.allclose(C.process(input_data), N.process(input_data, 2),
+                           rtol=0, atol=1e-12)
+    for input_data in inputs[10:]:
+        assert np.allclose(C.process(input_data, 3), N.process(input_data, 3),
+                           rtol=0, atol=1e-12)
+
+
+def test_instances_have_their_own_state(tmp_path):
+    N = network(False)
+    file_name = N.compile(str(tmp_path/"net"), target="shared")
+    first = Compiled_Network(file_name)
+    second = Compiled_Network(file_name)
+    inputs = np.random.uniform(-1, 1, (6, 3))
+    first.process_batch(inputs)
+    first.reset()
+    N.reset()
+    # Each instance goes on from its own values
+    for input_data in inputs:
+        assert np.allclose(first.process(input_data), N.process(input_data),
+                           rtol=0, atol=1e-12)
+    N = network(False)
+    for input_data in inputs:
+        assert np.allclose(second.process(input_data), N.process(input_data),
+                           rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("reset_after_process", [True, False],
+                         ids=["reset", "kept"])
+def test_quantized_within_reported_error(tmp_path, reset_after_process):
+    N = network(reset_after_process)
+    trace = np.random.uniform(-1, 1, (30, 3))
+    file_name = N.compile(str(tmp_path/"net"), target="shared",
+                          nb_iterations=2, quantize=trace)
+    max_error, mean_error = N.quantized_error
+    # Mostly the rounding of the int8 weights, on outputs in [-1, 1]
+    assert 0 < max_error < 5e-2
+    assert mean_error <= max_error
+    C = Compiled_Network(file_name)
+    N.reset()
+    error = np.abs(C.process_batch(trace)
+                   - [N.process(input_data, 2) for input_data in trace])
+    assert error.max() <= max_error
+    assert np.isclose(error.mean(), mean_error)
+
+
+def test_cache_keeps_what_it_just_compiled(tmp_path):
+    # Any artifact is bigger than the cache
+    cache = Compile_Cache(str(tmp_path/"cache"), max_size=1)
+    first = network(True)
+    compilation = cache.compile(first, target="shared")
+    assert not os.path.exists(compilation.file_name)
+    file_name = compilation.result()
+    assert os.path.exists(file_name)
+    second = network(False)
+    assert os.path.exists(second.compile(target="shared", cache=cache))
+    # The first one goes to make room for the second one
+    assert not os.path.exists(file_name)
+    # and comes back when it is needed again
+    assert first.compile(target="shared", cache=cache) == file_name
+    assert os.path.exists(file_name)
+
+
+def test_native_code_keyed_by_cpu(tmp_path, monkeypatch):
+    cache = Compile_Cache(str(tmp_path/"cache"))
+    N = network(True)
+    native = cache.compile(N, target="shared", flags=("-O3", "-march=native"))
+    portable = cache.compile(N, target="shared", flags=("-O3", ))
+    # Another CPU with the same architecture
+    monkeypatch.setitem(Compiler.native_targets, ("-march=native", ),
+                        "another CPU")
+    other = cache.compile(N, target="shared", flags=("-O3", "-march=native"))
+    assert other.file_name != native.file_name
+    assert cache.compile(N, target="shared", flags=("-O3", )) is portable
+    for compilation in [native, portable, other]:
+        compilation.result()
@@ -0,0 +1,141 @@
+import numpy as np
+import pytest
+
+from Car import Car, Circuit
+from Classifier import Classifier
+from CPU_AI import (Herd, segments, Serial_Evaluator, Process_Evaluator,
+                    Shared_Evaluator, Shard_Evaluator, Dynamic_Evaluator,
+                    Thread_Evaluator, Auto_Evaluator, Scalar_Batch)
+
+
+def evolve(evaluator, circuit = False):
+    np.random.seed(0)
+    H = Herd(12, 2, 4, 1, segments, True, 8, 0.5, 0.3, 2, archive_top=0,
+             run=9, evaluator=evaluator)
+    for member in H.members:
+        member.set_genome(3*member.genome())
+    np.random.seed(1)
+    problem = Car(False, 4, Δd=0.1, circuit=Circuit(4) if circuit else None)
+    scores = H.evolve(problem, 3)
+    return(scores, np.stack([member.genome() for member in H.members]))
+
+
+@pytest.mark.parametrize("circuit", [False, True], ids=["new", "fixed"])
+@pytest.mark.parametrize("make_evaluator", [
+    lambda: Process_Evaluator(nb_workers=2),
+    lambda: Shared_Evaluator(nb_workers=2),
+    lambda: Dynamic_Evaluator(nb_workers=2),
+    lambda: Thread_Evaluator(nb_workers=3),
+], ids=["process", "shared", "dynamic", "thread"])
+def test_same_run_as_serial(tmp_path, monkeypatch, make_evaluator, circuit):
+    monkeypatch.chdir(tmp_path)
+    serial_scores, serial_genomes = evolve(None, circuit)
+    scores, genomes = evolve(make_evaluator(), circuit)
+    assert scores == serial_scores
+    assert np.array_equal(genomes, serial_genomes)
+
+
+def test_scalar_batch_same_scores_as_serial(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    scores = []
+    for batch in [False, True]:
+        np.random.seed(1)
+        circuit = Circuit(4)
+        np.random.seed(0)
+        H = Herd(12, 2, 4, 1, segments, True, 10, nb_tests=2, archive_top=0,
+                 run=9, batch=batch)
+        for member in H.members:
+            member.set_genome(3*member.genome())
+        H.evolve(Car(False, 4, Δd=0.1, circuit=circuit), 1)
+        scores.append(np.array(H.score))
+    # No randomness on a fixed circuit, a batch runs the same episodes
+    assert np.array_equal(scores[0], scores[1])
+
+
+def test_own_experience_stays_scalar(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # Classifier runs its own loop in experience, it has no step
+    with pytest.raises(ValueError):
+        Scalar_Batch(Classifier())
+    scores = []
+    for batch in [False, True]:
+        np.random.seed(0)
+        H = Herd(2, 1, 4, 1, segments, True, 6, nb_tests=1, archive_top=0,
+                 run=9, batch=batch)
+        scores.append(H.evolve(Classifier(), 2))
+        assert not isinstance(H.Problem, Scalar_Batch)
+    assert scores[0] == scores[1]
+
+
+@pytest.mark.parametrize("make_evaluator", [
+    lambda: Serial_Evaluator(),
+    lambda: Process_Evaluator(nb_workers=2),
+    lambda: Shared_Evaluator(nb_workers=2),
+    lambda: Shard_Evaluator(nb_workers=2),
+    lambda: Dynamic_Evaluator(nb_workers=2),
+    lambda: Thread_Evaluator(nb_workers=3),
+    lambda: Auto_Evaluator(),
+    lambda: Auto_Evaluator(nb_workers=2),
+], ids=["serial", "process", "shared", "shard", "dynamic", "thread", "auto",
+        "auto_fixed"])
+def test_steady_state(tmp_path, monkeypatch, make_evaluator):
+    monkeypatch.chdir(tmp_path)
+    evaluator = make_evaluator()
+    np.random.seed(0)
+    H = Herd(12, 2, 4, 1, segments, True, 8, 0.5, 0.3, 2, archive_top=0,
+             run=9, evaluator=evaluator)
+    np.random.seed(1)
+    scores = H.evolve(Car(False, 4, Δd=0.1, circuit=Circuit(4)), 3,
+                      steady=True)
+    assert len(scores) == 3
+    # A child replaces the worst member, never the best one
+    assert scores == sorted(scores)
+    assert len(H.members) == 8
+    assert evaluator.nb_workers >= 1
+
+
+@pytest.mark.parametrize("steady", [False, True], ids=["generations",
+                                                       "steady"])
+@pytest.mark.parametrize("make_evaluator", [
+    lambda: Process_Evaluator(nb_workers=2),
+    lambda: Shared_Evaluator(nb_workers=2),
+    lambda: Shard_Evaluator(nb_workers=2),
+    lambda: Thread_Evaluator(nb_workers=3),
+    lambda: Auto_Evaluator(nb_workers=2),
+], ids=["process", "shared", "shard", "thread", "auto"])
+def test_stopped_after_a_failure(tmp_path, monkeypatch, make_evaluator,
+                                 steady):
+    monkeypatch.chdir(tmp_path)
+    evaluator = make_evaluator()
+    H = Herd(12, 2, 4, 1, segments, True, 8, archive_top=0, run=9,
+             evaluator=evaluator)
+
+    def fail(*args):
+        raise(RuntimeError("failure"))
+    # Fails once the first generation is evaluated
+    monkeypatch.setattr(H, "save_generation", fail)
+    with pytest.raises(RuntimeError):
+        H.evolve(Car(False, 4, Δd=0.1, circuit=Circuit(4)), 3, steady=steady)
+    evaluator = getattr(evaluator, "evaluator", evaluator)
+    assert getattr(evaluator, "pool", None) == None
+    assert getattr(evaluator, "blocks", []) == []
+
+
+def test_threads_leave_numpy_alone(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    functions = [np.random.seed, np.random.choice, np.random.randint]
+    H = Herd(12, 2, 4, 1, segments, True, 8, archive_top=0, run=9,
+             evaluator=Thread_Evaluator(nb_workers=3))
+    drawn = []
+
+    def draw(H):
+        # The generator of the main thread goes on where it was
+        assert [np.random.seed, np.random.choice,
+                np.random.randint] == functions
+        drawn.append(np.random.random())
+    H.migration = draw
+    problem = Car(False, 4, Δd=0.1)
+    np.random.seed(1)
+    H.evolve(problem, 2)
+    np.random.seed(1)
+    assert drawn == list(np.random.random(2))
@@ -0,0 +1,51 @@
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from AI import Network, sigmoid, ramp, segments, threshold
+
+
+def allocated(N, input_data, nb_processes = 50):
+    """
+    The peak of the memory allocated by nb_processes processes of N, once
+    numpy has filled its caches
+    """
+    for i in range(nb_processes):
+        N.process(input_data, 2)
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    for i in range(nb_processes):
+        N.process(input_data, 2)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return(peak - start)
+
+
+@pytest.mark.parametrize("sliced", [False, True], ids=["dense", "sliced"])
+@pytest.mark.parametrize("function", [sigmoid, ramp, segments, threshold])
+def test_buffered_process_does_not_allocate(function, sliced):
+    np.random.seed(0)
+    kwargs = {}
+    if sliced:
+        kwargs = {"slices": [4, 996, 2], "regions": [[0, 0, 0], [1, 1, 0],
+                                                    [0, 1, 0]]}
+    N = Network(4, 2, 996, 1, function, True, buffered=True, **kwargs)
+    input_data = np.random.uniform(-1, 1, 4)
+    # Far less than the values of the Network (1002 doubles), only the small
+    # objects of the views of the values
+    assert allocated(N, input_data) < 8*N.nb_neurons//2
+    N.buffered = False
+    assert allocated(N, input_data) >= 8*N.nb_neurons
+
+
+@pytest.mark.parametrize("function", [sigmoid, ramp, segments, threshold])
+def test_buffered_process_same_outputs(function):
+    np.random.seed(0)
+    N = Network(4, 2, 10, 1, function, False)
+    B = Network(4, 2, 10, 1, function, False, weights=N.weights,
+                bias=N.bias, buffered=True)
+    for input_data in np.random.uniform(-1, 1, (10, 4)):
+        assert np.allclose(B.process(input_data, 2),
+                           N.process(input_data, 2), rtol=0, atol=1e-15)
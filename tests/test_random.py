@@ -0,0 +1,94 @@
+import ctypes
+import os
+
+import numpy as np
+import pytest
+
+from Random import (philox, random_bits, uniform, normal, Counter_Random,
+                    MUTATION_STREAM)
+from Compiler import compile_c
+
+
+# The known answers of Philox4x32-10 (kat_vectors of Random123)
+KNOWN_ANSWERS = [
+    ((0, 0, 0, 0), (0, 0),
+     (0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8)),
+    ((0xffffffff, 0xffffffff, 0xffffffff, 0xffffffff),
+     (0xffffffff, 0xffffffff),
+     (0x408f276d, 0x41c83b0e, 0xa20bc7c6, 0x6d5451fd)),
+    ((0x243f6a88, 0x85a308d3, 0x13198a2e, 0x03707344),
+     (0xa4093822, 0x299f31d0),
+     (0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1)),
+]
+
+
+@pytest.mark.parametrize("counter, key, expected", KNOWN_ANSWERS)
+def test_philox_known_answers(counter, key, expected):
+    assert [int(word) for word in philox(counter, key)] == list(expected)
+
+
+@pytest.fixture(scope="module")
+def random_c(tmp_path_factory):
+    source = os.path.join(os.path.dirname(os.path.dirname(
+        os.path.abspath(__file__))), "Random.c")
+    f = open(source)
+    c_code = f.read()
+    f.close()
+    library = ctypes.CDLL(os.path.abspath(compile_c(
+        c_code, str(tmp_path_factory.mktemp("random")/"random.so"),
+        shared=True)))
+    library.random_bits.argtypes = [ctypes.c_uint32]*6 + [
+        ctypes.POINTER(ctypes.c_uint32)]
+    library.random_bits.restype = None
+    for name in ["random_uniform", "random_normal"]:
+        getattr(library, name).argtypes = [ctypes.c_uint32]*6
+        getattr(library, name).restype = ctypes.c_double
+    return(library)
+
+
+ADDRESSES = [(0, 0, 0, 0, 0, 0), (7, 1, 3, 0xFFFFFFFF, 2, 11),
+             (0xFFFFFFFF, 2, 0xFFFFFFFF, 5, 0xFFFFFFFF, 0xFFFFFFFF),
+             (123456789, 0, 42, 17, 3, 1000)]
+
+
+@pytest.mark.parametrize("run, stream, generation, member, test, step",
+                         ADDRESSES)
+def test_same_numbers_in_c(random_c, run, stream, generation, member, test,
+                           step):
+    out = (ctypes.c_uint32*4)()
+    random_c.random_bits(run, stream, generation, member, test, step, out)
+    assert list(out) == [int(word) for word in random_bits(
+        run, generation, member, test, step, stream)]
+    assert random_c.random_uniform(run, stream, generation, member, test,
+                                   step) == uniform(run, generation, member,
+                                                    test, step, stream)
+    # Up to the rounding of log and cos
+    assert np.isclose(random_c.random_normal(run, stream, generation, member,
+                                             test, step),
+                      normal(run, generation, member, test, step, stream),
+                      rtol=1e-13, atol=1e-13)
+
+
+def test_members_draw_on_their_own():
+    together = Counter_Random(3, 5, stream=MUTATION_STREAM)
+    alone = Counter_Random(3, 5, member=4, stream=MUTATION_STREAM)
+    assert np.array_equal(together.random((10, 20))[4],
+                          alone.random((1, 20))[0])
+    assert np.array_equal(together.normal(0, 1, (10, 20))[4],
+                          alone.normal(0, 1, (1, 20))[0])
+
+
+def test_masked_normal():
+    size = (10, 1000)
+    indexes, values = Counter_Random(3, 5).masked_normal(0, 0.5, size, 0.05)
+    # The normals at the mask are the ones of the full draw
+    assert np.array_equal(values,
+                          Counter_Random(3, 5).normal(0, 0.5, size).ravel()
+                          [indexes])
+    assert 0.03 < len(indexes)/np.prod(size) < 0.07
+    # and each member has the same mask whoever it is drawn with
+    alone, alone_values = Counter_Random(3, 5, member=4).masked_normal(
+        0, 0.5, (1, 1000), 0.05)
+    row = indexes[indexes//1000 == 4]
+    assert np.array_equal(row%1000, alone)
+    assert np.array_equal(values[indexes//1000 == 4], alone_values)
@@ -0,0 +1,123 @@
+import copy
+import os
+
+import numpy as np
+import pytest
+
+from AI import (Network, Herd, Archive, load_network, load_Herd,
+                convert_save, unique_date, sigmoid, ramp, segments, threshold)
+
+
+SLICES = {"slices": [2, 3, 4, 1], "regions": [[0, 0, 0, 0],
+                                             [1, 0, 1, 0],
+                                             [1, 1, 1, 0],
+                                             [0, 1, 1, 0]]}
+
+
+def network(function, sliced):
+    np.random.seed(0)
+    if sliced:
+        N = Network(2, 1, 7, 2, function, False, **SLICES)
+    else:
+        N = Network(2, 1, 7, 2, function, False)
+    N.process(np.array([0.3, -0.2]))
+    return(N)
+
+
+def same_network(N, M):
+    assert (M.nb_sensors, M.nb_actors, M.nb_add_neurons, M.period) == (
+        N.nb_sensors, N.nb_actors, N.nb_add_neurons, N.period)
+    assert M.function is N.function
+    assert M.reset_after_process == N.reset_after_process
+    assert getattr(M, "slices", None) == getattr(N, "slices", None)
+    assert np.array_equal(M.genome(), N.genome())
+    assert np.array_equal(M.values, N.values)
+    input_data = np.array([-0.5, 0.8])
+    assert np.array_equal(copy.deepcopy(M).process(input_data),
+                          copy.deepcopy(N).process(input_data))
+
+
+@pytest.mark.parametrize("sliced", [False, True], ids=["dense", "sliced"])
+@pytest.mark.parametrize("function", [sigmoid, ramp, segments, threshold])
+@pytest.mark.parametrize("compress, mmap", [(False, False), (True, False),
+                                            (False, True)],
+                         ids=["plain", "compressed", "mmap"])
+def test_network_round_trip(tmp_path, function, sliced, compress, mmap):
+    N = network(function, sliced)
+    file_name = str(tmp_path/"network")
+    N.save(file_name, "w", False, compress=compress)
+    networks = load_network(file_name, mmap)
+    assert len(networks) == 1
+    same_network(N, networks[0])
+
+
+def test_several_networks_in_a_file(tmp_path):
+    file_name = str(tmp_path/"networks")
+    saved = [network(segments, False), network(ramp, True),
+             network(sigmoid, False)]
+    for N in saved:
+        N.save(file_name, "a", False, compress=N.function is ramp)
+    for N, M in zip(saved, load_network(file_name)):
+        same_network(N, M)
+
+
+def test_text_round_trip(tmp_path):
+    # The text format only knows the Networks of the defaults of Network
+    np.random.seed(0)
+    N = Network(2, 1, 7, 2)
+    N.values = np.random.rand(N.nb_neurons)
+    file_name = str(tmp_path/"network")
+    N.save(file_name, "w", False, binary=False)
+    # str of a float64 is exact
+    same_network(N, load_network(file_name)[0])
+    same_network(N, load_network(convert_save(file_name))[0])
+
+
+def test_herd_round_trip(tmp_path):
+    np.random.seed(0)
+    H = Herd(2, 1, 7, 2, segments, False, size=4, archive_top=0)
+    file_name = str(tmp_path/"herd")
+    H.save(file_name, False, compress=True)
+    L = load_Herd(file_name, size=6)
+    for i, member in enumerate(L.members):
+        same_network(H.members[i%4], member)
+
+
+def test_archive_round_trip(tmp_path):
+    file_name = str(tmp_path/"archive")
+    networks = [network(segments, False), network(ramp, True)]
+    archive = Archive(file_name)
+    for generation in range(3):
+        archive.append(networks, [2.0 + generation, 1.0], generation,
+                       compress=generation == 1)
+    archive = Archive(file_name)
+    assert len(archive) == 6
+    assert np.array_equal(archive.scores(0), [2.0, 3.0, 4.0])
+    for generation in range(3):
+        for rank, N in enumerate(networks):
+            same_network(N, archive.load(generation, rank))
+    same_network(networks[1], archive.load(2, 1, mmap=True))
+
+
+def test_archive_after_a_crash(tmp_path):
+    file_name = str(tmp_path/"archive")
+    networks = [network(segments, False), network(ramp, True)]
+    archive = Archive(file_name)
+    archive.append(networks, [2.0, 1.0], 0)
+    archive.append(networks, [3.0, 1.0], 1)
+    # A crash in the middle of the last record
+    f = open(file_name, "r+b")
+    f.truncate(os.path.getsize(file_name) - 20)
+    f.close()
+    archive = Archive(file_name)
+    assert len(archive) == 3
+    with pytest.raises(KeyError):
+        archive.load(1, 1)
+    archive.append(networks[1:], [5.0], 2)
+    archive = Archive(file_name)
+    assert np.array_equal(archive.scores(0), [2.0, 3.0, 5.0])
+    same_network(networks[1], archive.load(2))
+
+
+def test_herd_files_do_not_collide():
+    assert unique_date() != unique_date()
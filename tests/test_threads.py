@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+import Threads
+from Threads import (limit_threads, restore_threads, openblas_threads,
+                     thread_limiter, Thread_Budget)
+
+
+def openblas_counts():
+    return([get_threads() for get_threads, set_threads in openblas_threads()])
+
+
+def test_limit_and_restore_environment():
+    before = os.environ.get("OMP_NUM_THREADS")
+    saved = limit_threads(1)
+    assert os.environ["OMP_NUM_THREADS"] == "1"
+    restore_threads(saved)
+    assert os.environ.get("OMP_NUM_THREADS") == before
+
+
+def test_limit_and_restore_openblas(monkeypatch):
+    monkeypatch.setattr(Threads, "threadpoolctl", None)
+    if openblas_threads() == []:
+        pytest.skip("numpy is not linked to OpenBLAS")
+    before = openblas_counts()
+    saved = limit_threads(2)
+    assert openblas_counts() == [2]*len(before)
+    restore_threads(saved)
+    assert openblas_counts() == before
+    assert thread_limiter() == "OpenBLAS"
+
+
+def test_limit_and_restore_threadpoolctl():
+    # The version of requirements.txt
+    threadpoolctl = pytest.importorskip("threadpoolctl")
+    before = threadpoolctl.threadpool_info()
+    budget = Thread_Budget()
+    budget.layout(512*len(budget.cores), nb_workers=1)
+    budget.apply()
+    assert "threadpoolctl" in budget.report()
+    if openblas_threads() != []:
+        assert openblas_counts() == [budget.nb_threads]*len(openblas_threads())
+    budget.release()
+    assert threadpoolctl.threadpool_info() == before
+
+
+def test_report_without_limiter(monkeypatch):
+    monkeypatch.setattr(Threads, "threadpoolctl", None)
+    monkeypatch.setattr(Threads, "openblas_threads", lambda: [])
+    assert "no limit applied" in Thread_Budget().report()